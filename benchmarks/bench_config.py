@@ -0,0 +1,106 @@
+"""asv benchmarks for FrozenDicts and config parsing (see asv.conf.json).
+
+Usage: asv run (or asv continuous master HEAD to compare two commits)
+"""
+
+import os
+import tempfile
+
+from profane import FrozenDict
+from profane.cli import config_string_to_dict
+from profane.config_option import convert_list_to_string
+
+from benchmarks.frozendict import nested_config
+
+
+class FrozenDictNested:
+    params = [5, 20]
+    param_names = ["depth"]
+
+    def setup(self, depth):
+        self.config = nested_config(depth)
+        self.frozen = FrozenDict(self.config)
+        self.different = FrozenDict({**self.config, "option0": -1})
+        hash(self.frozen), hash(self.different)
+
+    def time_construct(self, depth):
+        FrozenDict(self.config)
+
+    def time_hash(self, depth):
+        # hashes are cached, so hash a copy that has not been hashed yet
+        hash(FrozenDict._from_dict(dict(self.frozen._d), None))
+
+    def time_eq_dict(self, depth):
+        self.frozen == self.config
+
+    def time_eq_different(self, depth):
+        self.frozen == self.different
+
+    def time_unfrozen_copy(self, depth):
+        self.frozen.unfrozen_copy()
+
+
+class FrozenDictWide:
+    params = [100, 10000]
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.config = {f"key{i}": i for i in range(size)}
+        self.frozen = FrozenDict(self.config)
+        hash(self.frozen)
+
+    def time_construct(self, size):
+        FrozenDict(self.config)
+
+    def time_hash(self, size):
+        hash(FrozenDict._from_dict(dict(self.frozen._d), None))
+
+    def time_eq_dict(self, size):
+        self.frozen == self.config
+
+    def time_unfrozen_copy(self, size):
+        self.frozen.unfrozen_copy()
+
+    def peakmem_construct(self, size):
+        FrozenDict({f"key{i}": [i, i] for i in range(size)})
+
+
+class ConfigString:
+    params = [100, 5000]
+    param_names = ["lines"]
+
+    def setup(self, lines):
+        fd, self.fn = tempfile.mkstemp(suffix=".txt", prefix="profane-asv-")
+        with os.fdopen(fd, "wt") as f:
+            for i in range(lines):
+                f.write(f"module{i % 50}.submodule{i % 7}.option{i}={i * 0.1:.2f}  # comment\n")
+
+        self.config_string = " ".join(f"module{i % 50}.option{i}=value{i}" for i in range(lines))
+
+    def teardown(self, lines):
+        os.unlink(self.fn)
+
+    def time_config_string_to_dict(self, lines):
+        config_string_to_dict(self.config_string)
+
+    def time_config_file_to_dict(self, lines):
+        config_string_to_dict(f"file={self.fn} module0.option0=override")
+
+
+class ListToString:
+    params = [100, 10000]
+    param_names = ["length"]
+
+    def setup(self, length):
+        self.floats = [round(0.01 * i, 2) for i in range(length)]
+        self.irregular = [round(0.01 * i * i, 4) for i in range(length)]
+        self.ints = list(range(length))
+
+    def time_float_range(self, length):
+        convert_list_to_string(self.floats, float)
+
+    def time_float_list(self, length):
+        convert_list_to_string(self.irregular, float)
+
+    def time_int_range(self, length):
+        convert_list_to_string(self.ints, int)
@@ -0,0 +1,126 @@
+"""asv benchmarks for constructing module graphs and computing their paths (see asv.conf.json).
+
+Usage: asv run (or asv continuous master HEAD to compare two commits)
+"""
+
+import tempfile
+from pathlib import Path
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, module_registry
+
+from benchmarks.module_path import register_chain
+
+
+def register_wide(width, options=4):
+    """Register a root module with `width` dependencies of different types, each of which has `options` config options"""
+
+    module_registry.reset()
+    dependencies = []
+    for i in range(width):
+        attrs = {
+            "module_type": f"child{i}",
+            "module_name": "wide",
+            "config_spec": [ConfigOption(f"option{j}", j) for j in range(options)],
+        }
+        ModuleBase.register(type(f"Child{i}", (ModuleBase,), attrs))
+        dependencies.append(Dependency(key=f"child{i}", module=f"child{i}", name="wide"))
+
+    attrs = {"module_type": "root", "module_name": "wide", "dependencies": dependencies, "config_spec": [ConfigOption("k", 1)]}
+    ModuleBase.register(type("WideRoot", (ModuleBase,), attrs))
+    return module_registry.lookup("root", "wide")
+
+
+def register_provided_chain(depth):
+    """Register a root module that provides a leaf module to a chain of `depth` modules (see `register_chain`),
+    which is how pipelines like rank tasks provide their benchmark to the modules under them"""
+
+    register_chain(depth)
+    attrs = {
+        "module_type": "root",
+        "module_name": "provided",
+        "dependencies": [
+            Dependency(key="leaf", module="leaf", name="leaf", provide_this=True),
+            Dependency(key="chain", module=f"level{depth - 1}", name="chain"),
+        ],
+    }
+    ModuleBase.register(type("ProvidedRoot", (ModuleBase,), attrs))
+    return module_registry.lookup("root", "provided")
+
+
+def _use_temporary_cache():
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = Path(tempfile.mkdtemp(prefix="profane-asv-"))
+
+
+class ConstructWide:
+    params = [10, 100]
+    param_names = ["width"]
+
+    def setup(self, width):
+        _use_temporary_cache()
+        self.cls = register_wide(width)
+
+    def time_construct(self, width):
+        # clear the caches so that every dependency is constructed again
+        module_registry.shared_objects.clear()
+        module_registry.config_cache.clear()
+        self.cls({"k": 2})
+
+    def time_construct_shared(self, width):
+        # dependencies are reused from the shared object cache
+        self.cls({"k": 2})
+
+
+class ConstructDeep:
+    params = [10, 50]
+    param_names = ["depth"]
+
+    def setup(self, depth):
+        _use_temporary_cache()
+        self.cls = register_chain(depth)
+
+    def time_construct(self, depth):
+        module_registry.shared_objects.clear()
+        module_registry.config_cache.clear()
+        self.cls()
+
+    def time_construct_shared(self, depth):
+        self.cls()
+
+
+class CreateProvided:
+    params = [10, 50, 150]
+    param_names = ["depth"]
+
+    def setup(self, depth):
+        _use_temporary_cache()
+        self.cls = register_provided_chain(depth)
+
+    def time_create(self, depth):
+        # every module under the root is created with the (real) leaf module in provide
+        module_registry.shared_objects.clear()
+        module_registry.config_cache.clear()
+        self.cls.create("provided")
+
+
+class ModulePath:
+    params = [10, 50]
+    param_names = ["depth"]
+
+    def setup(self, depth):
+        _use_temporary_cache()
+        self.root = register_chain(depth)()
+
+    def time_get_module_path(self, depth):
+        self.root.get_module_path()
+
+    def time_get_module_path_cold(self, depth):
+        # only the root's path is computed again; those of its dependencies are memoized
+        self.root._module_paths.clear()
+        self.root.get_module_path()
+
+    def time_get_module_path_skip_keys(self, depth):
+        self.root.get_module_path(skip_config_keys=["option0"])
+
+    def time_get_cache_path(self, depth):
+        self.root.get_cache_path()
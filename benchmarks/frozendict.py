@@ -0,0 +1,66 @@
+"""Micro-benchmark for FrozenDict operations on configs with several levels of nesting.
+
+Usage: PYTHONPATH=. python benchmarks/frozendict.py [DEPTH ...]
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+from profane import FrozenDict
+
+
+def nested_config(depth, width=4):
+    """Return a config resembling a module graph `depth` levels deep, where each module has `width` options"""
+
+    config = {f"option{i}": i for i in range(width)}
+    config["name"] = "leaf"
+    for level in range(depth - 1):
+        config = {"name": f"module{level}", "dependency": config, "tuple": [1, 2, 3], **{f"option{i}": i for i in range(width)}}
+
+    return config
+
+
+def benchmark(depth, number=2000):
+    config = nested_config(depth)
+    frozen = FrozenDict(config)
+    equal = FrozenDict(config)
+    different = FrozenDict({**config, "option0": -1})
+    hash(frozen), hash(equal), hash(different)
+    cache = {frozen: True}
+
+    cases = {
+        "construct": lambda: FrozenDict(config),
+        "construct from FrozenDict": lambda: FrozenDict(frozen),
+        "unfrozen_copy": frozen.unfrozen_copy,
+        "eq (equal FrozenDict)": lambda: frozen == equal,
+        "eq (different FrozenDict)": lambda: frozen == different,
+        "eq (dict)": lambda: frozen == config,
+        "dict lookup": lambda: cache.get(equal),
+    }
+
+    print(f"depth={depth}")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"  {name:<28} {seconds / number * 1e6:8.2f} us")
+
+    size = sys.getsizeof(frozen) + (sys.getsizeof(frozen.__dict__) if hasattr(frozen, "__dict__") else 0)
+    print(f"  {'instance size':<28} {size:8d} bytes")
+
+
+def sweep_memory(depth, n=1000):
+    """Measure the memory held by `n` configs that differ only in their top-level options"""
+
+    base = nested_config(depth)
+    tracemalloc.start()
+    configs = [FrozenDict({**base, "option0": i}) for i in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {f'sweep of {len(configs)} configs':<28} {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    for depth in [int(arg) for arg in sys.argv[1:]] or [5, 10]:
+        benchmark(depth)
+        sweep_memory(depth)
@@ -0,0 +1,61 @@
+"""Benchmark for get_module_path and get_cache_path on deep module graphs.
+
+Usage: PYTHONPATH=. python benchmarks/module_path.py [DEPTH ...]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, module_registry
+
+
+def register_chain(depth, width=4):
+    """Register a chain of `depth` modules where each module depends on the previous one and on a shared leaf module"""
+
+    module_registry.reset()
+    ModuleBase.register(type("Leaf", (ModuleBase,), {"module_type": "leaf", "module_name": "leaf"}))
+
+    for level in range(depth):
+        dependencies = [Dependency(key="leaf", module="leaf", name="leaf")]
+        if level > 0:
+            dependencies.insert(0, Dependency(key="previous", module=f"level{level - 1}", name="chain"))
+
+        attrs = {
+            "module_type": f"level{level}",
+            "module_name": "chain",
+            "dependencies": dependencies,
+            "config_spec": [ConfigOption(f"option{i}", i) for i in range(width)],
+        }
+        ModuleBase.register(type(f"Level{level}", (ModuleBase,), attrs))
+
+    return module_registry.lookup(f"level{depth - 1}", "chain")
+
+
+def benchmark(depth, number=1000):
+    root_cls = register_chain(depth)
+    root = root_cls.create("chain")
+
+    def cold():
+        # paths of the root are computed again, but those of its (shared) dependencies are reused
+        root._module_paths.clear()
+        root._cache_paths.clear()
+        return root.get_cache_path()
+
+    cases = {
+        "get_cache_path (new root)": cold,
+        "get_module_path": root.get_module_path,
+        "get_module_path (skip keys)": lambda: root.get_module_path(skip_config_keys=["option0"]),
+        "get_cache_path": root.get_cache_path,
+    }
+
+    print(f"depth={depth}")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"  {name:<28} {seconds / number * 1e6:10.2f} us")
+
+
+if __name__ == "__main__":
+    constants["CACHE_BASE_PATH"] = Path("/tmp/profane-benchmark")
+    for depth in [int(arg) for arg in sys.argv[1:]] or [5, 10]:
+        benchmark(depth)
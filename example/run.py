@@ -3,12 +3,17 @@ import sys
 
 from docopt import docopt
 
-from profane import DBManager, config_list_to_dict, constants
+from profane import DBManager, config_list_to_dict, constants, expand_sweep, module_registry
 
 # specify a base package that we should look for modules under (e.g., <BASE>.task)
 # constants must be specified before importing Task (or any other modules!)
 constants["BASE_PACKAGE"] = "example"
 
+# if a manifest has been generated (with: PYTHONPATH=.. python -m profane manifest .), import only the modules that are used
+manifest_fn = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profane_manifest.json")
+if os.path.exists(manifest_fn):
+    module_registry.use_manifest(manifest_fn)
+
 from task import Task
 
 
@@ -32,11 +37,24 @@ def parse_task_string(s):
 
 def prepare_task(fullcommand, config):
     taskstr, commandstr = parse_task_string(fullcommand)
-    task = Task.create(taskstr, config)
+    task_cls = Task.lookup(taskstr)
+
+    # help commands only describe the pipeline, so resolve it without building any modules
+    if commandstr in task_cls.help_commands:
+        task = task_cls.resolve(config)
+    else:
+        task = Task.create(taskstr, config)
+
     task_entry_function = getattr(task, commandstr)
     return task, task_entry_function
 
 
+def run_task(fullcommand, config):
+    """Run a queued task; used by the worker started with: profane worker $EXAMPLE_DB run:run_task"""
+    task, task_entry_function = prepare_task(fullcommand, config)
+    task_entry_function()
+
+
 if __name__ == "__main__":
     help = """
             Usage:
@@ -50,11 +68,14 @@ if __name__ == "__main__":
               -l VALUE --loglevel=VALUE     Set the log level: DEBUG, INFO, WARNING, ERROR, or CRITICAL.
               -p VALUE --priority=VALUE     Sets the priority for a queued up experiment. No effect without -q flag.
               -q --queue                    Only queue this run, do not start it.
+              -s --sweep                    Queue one run per config in the sweep described by CONFIG. Implies -q.
 
 
             Arguments:
               COMMAND   Name of command to run (see below for list of commands)
               CONFIG    Configuration assignments of the form foo.bar=17
+                        With --sweep, assignments may contain several values (foo.bar=1,2,3 or foo.bar=1..3,1)
+                        and are combined using 'x' (foo.bar=1,2 x foo.baz=a,b)
 
 
             Commands:
@@ -78,16 +99,29 @@ if __name__ == "__main__":
 
         os.environ["EXAMPLE_LOGGING"] = loglevel
 
-    # prepare task even if we're queueing, so that we validate the config
+    if not arguments["--priority"]:
+        arguments["--priority"] = 0
+
+    if arguments["--sweep"]:
+        # configs are validated without building modules as they are generated
+        taskstr, _ = parse_task_string(arguments["COMMAND"])
+        configs = expand_sweep(arguments["CONFIG"], module_cls=Task.lookup(taskstr))
+
+        db = DBManager(os.environ.get("EXAMPLE_DB"))
+        run_ids = db.queue_runs((arguments["COMMAND"], config, arguments["--priority"]) for config in configs)
+        print(f"queued {len(run_ids)} runs")
+        sys.exit(0)
+
     config = config_list_to_dict(arguments["CONFIG"])
-    task, task_entry_function = prepare_task(arguments["COMMAND"], config)
 
     if arguments["--queue"]:
-        if not arguments["--priority"]:
-            arguments["--priority"] = 0
+        # validate the config without building the task
+        taskstr, _ = parse_task_string(arguments["COMMAND"])
+        Task.lookup(taskstr).resolve(config)
 
         db = DBManager(os.environ.get("EXAMPLE_DB"))
         db.queue_run(command=arguments["COMMAND"], config=config, priority=arguments["--priority"])
     else:
+        task, task_entry_function = prepare_task(arguments["COMMAND"], config)
         print(f"starting {arguments['COMMAND']} with config: {task.config}\n")
         task_entry_function()
@@ -12,8 +12,9 @@ class Task(ModuleBase):
         print("Configuration:")
         self.print_module_config(prefix="  ")
 
-    def print_paths(self):  # TODO
-        pass
+    def print_paths(self):
+        print("Module paths:")
+        print("  " + self.get_module_path())
 
     def print_pipeline(self):
         print(f"Module graph:")
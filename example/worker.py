@@ -13,14 +13,11 @@ db = sql.DBManager(os.environ.get("EXAMPLE_DB"))
 
 
 def try_run(run):
-    if run.status not in ["QUEUED", "FAILED"]:
-        return
-
-    db.started_event(run)
-
     try:
-        task, func = prepare_task(run.command, run.config)
-        func()
+        # building the task's modules can take a long time, so heartbeats are recorded while it is prepared too
+        with db.heartbeat(run):
+            task, func = prepare_task(run.command, run.config)
+            func()
         db.completed_event(run)
         print("run finished")
         return True
@@ -38,8 +35,10 @@ print("%s checking for work" % datetime.datetime.now())
 
 try:
     db.clear_zombie_runs()
+    db.clear_stale_runs()
 
-    run = db.get_eligible_run(max_tries=3)
+    # claim_run marks the run as started
+    run = db.claim_run(max_tries=3)
     if run:
         try_run(run)
 
@@ -1,9 +1,13 @@
+import importlib
+
 import profane.base
+from profane.cache import cached
 from profane.cli import config_list_to_dict
 from profane.config_option import ConfigOption
 from profane.exceptions import PipelineConstructionError, InvalidConfigError, InvalidModuleError
 from profane.frozendict import FrozenDict
-from profane.sql import DBManager
+from profane.sweep import expand_sweep
+from profane.trace import Tracer
 
 __version__ = "0.2.4"
 
@@ -12,3 +16,19 @@ module_registry = profane.base.module_registry
 import_all_modules = profane.base.import_all_modules
 Dependency = profane.base.Dependency
 ModuleBase = profane.base.ModuleBase
+ResolvedModule = profane.base.ResolvedModule
+
+
+# these are imported on first use, because importing them (and SQLAlchemy) is slow and most pipelines do not need them
+_lazy_attributes = {"DBManager": "profane.sql", "CacheCatalog": "profane.catalog", "Worker": "profane.worker"}
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        return getattr(importlib.import_module(_lazy_attributes[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes))
@@ -0,0 +1,18 @@
+import sys
+
+import profane.manifest
+import profane.worker
+
+
+def main(argv=None):
+    """Entry point for the profane command, which dispatches to the worker and manifest commands"""
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "manifest":
+        profane.manifest.main(argv)
+    else:
+        profane.worker.main(argv)
+
+
+if __name__ == "__main__":
+    main()
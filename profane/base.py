@@ -1,16 +1,23 @@
+import collections
+import contextvars
+import hashlib
 import importlib
+import inspect
+import json
 import logging
 import os
 import random
-import numpy as np
+import types
+from contextlib import contextmanager, nullcontext
 from glob import glob
 
-from colorama import Style, Fore
-
+from profane.cache import ArrayStore, LRUCache, SharedObjectCache, atomic_write
 from profane.cli import config_string_to_dict
 from profane.config_option import ConfigOption
 from profane.exceptions import PipelineConstructionError, InvalidConfigError, InvalidModuleError
 from profane.frozendict import FrozenDict
+from profane import parallel, trace
+from profane.locks import build_lock
 import profane.constants as constants
 
 logger = logging.getLogger(__name__)
@@ -24,12 +31,20 @@ constants = constants.ConstantsRegistry()
 class ModuleRegistry:
     """Keeps track of modules that have been registered with `ModuleBase.register`"""
 
+    # maximum number of resolved (sub)module configs to keep in `config_cache`
+    config_cache_size = 100000
+    # arguments for the `SharedObjectCache` holding objects shared by `ModuleBase.create` (by default, objects are never evicted)
+    shared_objects_maxsize = None
+    shared_objects_max_bytes = None
+
     def __init__(self):
         self.reset()
 
     def reset(self):
         self.registry = {}
-        self.shared_objects = {}
+        self.manifest = {}
+        self.shared_objects = SharedObjectCache(maxsize=self.shared_objects_maxsize, max_bytes=self.shared_objects_max_bytes)
+        self.config_cache = LRUCache(maxsize=self.config_cache_size)
 
     def register(self, cls):
         """Register a class that describes itself via a `module_type` and a `module_name variable."""
@@ -50,10 +65,36 @@ class ModuleRegistry:
             logger.warning(f"replacing entry {module_type_registry[cls.module_name]} for {cls.module_name} with {cls}")
 
         module_type_registry[cls.module_name] = cls
+        # cached configs may have been resolved using a class that was just replaced
+        self.config_cache.clear()
+
+    def use_manifest(self, manifest):
+        """Import modules on demand using a manifest generated by `profane.manifest.write_manifest` (or `profane manifest`).
+        `manifest` is the manifest's filename or a dict mapping (module_type, module_name) pairs to Python module names.
+
+        While a manifest is in use, `lookup` imports the Python module registering a module the first time it is needed,
+        so `import_all_modules` no longer imports every file in the packages covered by the manifest and `Dependency`
+        no longer imports each dependency's package.
+        """
+
+        if not isinstance(manifest, dict):
+            from profane.manifest import load_manifest
+
+            manifest = load_manifest(manifest)
+
+        self.manifest.update(manifest)
+
+    def covers_package(self, package):
+        """Return true if the manifest in use (if any) contains modules in `package`"""
+
+        return any(import_path.startswith(package + ".") for import_path in self.manifest.values())
 
     def lookup(self, module_type, module_name):
         """Return the class corresponding to a `module_type` and `module_name` pair."""
 
+        if module_name not in self.registry.get(module_type, {}) and (module_type, module_name) in self.manifest:
+            importlib.import_module(self.manifest[(module_type, module_name)])
+
         if module_type not in self.registry:
             raise ValueError(f"unknown module_type '{module_type}'; known types: {self.get_module_types()}")
 
@@ -65,10 +106,12 @@ class ModuleRegistry:
         return self.registry[module_type][module_name]
 
     def get_module_types(self):
-        return sorted(k for k in self.registry.keys() if len(self.registry[k]) > 0)
+        types_in_manifest = {module_type for module_type, module_name in self.manifest}
+        return sorted({k for k in self.registry.keys() if len(self.registry[k]) > 0} | types_in_manifest)
 
     def get_module_names(self, module_type):
-        return sorted(self.registry[module_type])
+        names_in_manifest = {name for manifest_type, name in self.manifest if manifest_type == module_type}
+        return sorted(set(self.registry.get(module_type, {})) | names_in_manifest)
 
     def get_registered_modules(self):
         return [
@@ -93,7 +136,8 @@ class Dependency:
 
     def __init__(self, key, module, name=None, default_config_overrides=None, provide_this=False, provide_children=None):
         try:
-            if "BASE_PACKAGE" in constants:
+            # with a manifest, the dependency's module is imported on demand by module_registry.lookup instead
+            if "BASE_PACKAGE" in constants and not module_registry.covers_package(constants["BASE_PACKAGE"]):
                 importlib.import_module(f"{constants['BASE_PACKAGE']}.{module}")
         except ModuleNotFoundError as e:
             pass
@@ -122,6 +166,9 @@ class ModuleBase:
     1) Any config options not present in `config` are filled in with their default values. Config options and their defaults are specified in the `config_spec` class attribute.
     2) Any dependencies declared in the `dependencies` class attribute are recursively instantiated. If the dependency object is present in `provide`, this object will be used instead of instantiating a new object for the dependency.
     3) The module object's `config` variable is updated to reflect the configs of its dependencies and then frozen.
+    4) If the module has a `build` method, it is called. When the BUILD_LOCK constant is "file" (to lock files under CACHE_BASE_PATH) or a database URL (to use leases in a `DBManager`), builds of modules with the same config are serialized across processes. The first process builds the module's cache, while the others wait and then build from the cache. Modules can set `lock_build = False` to skip this.
+    When the BUILD_WORKERS constant is greater than 1, the builds of the whole module graph are deferred until every module has been constructed and then run in that many threads, with each module built after its dependencies (see `BuildPlan`). Modules that do work after `ModuleBase.__init__` returns (rather than in `build`) should not rely on their dependencies being built in this mode.
+    `build` may also be defined with `async def`. Such builds are run on an event loop when the module is constructed or created synchronously, while `await ModuleBase.acreate(...)` awaits the builds of the module graph concurrently on the running loop.
 
     After construction is complete, the module's dependencies are available as instance variables: self.`dependency key`.
 
@@ -135,6 +182,8 @@ class ModuleBase:
     dependencies = []
     config_keys_not_in_path = []
     requires_random_seed = False
+    # if the BUILD_LOCK constant is set, only one process at a time may build a module with a given config
+    lock_build = True
 
     @staticmethod
     def register(cls):
@@ -159,7 +208,7 @@ class ModuleBase:
                     raise InvalidConfigError(f"seed={config[key]} was provided but cls.requires_random_seed=False")
                 if config["seed"] != constants["RANDOM_SEED"]:
                     raise InvalidConfigError(
-                        f"seed={config[key]} does not match constants.RANDOM_SEED={constants.RANDOM_SEED}. This indicates that different seeds were configured within the same process which is not possible. Please start a new process for each different seed."
+                        f"seed={config[key]} does not match constants['RANDOM_SEED']={constants['RANDOM_SEED']}. This indicates that different seeds were configured within the same scope. Use a separate constants.scope(RANDOM_SEED=...) for each different seed."
                     )
             elif key in dependencies:
                 if isinstance(config[key], str):
@@ -209,7 +258,7 @@ class ModuleBase:
         return config_as_strings
 
     @classmethod
-    def create(cls, name, config=None, provide=None, share_objects=True):
+    def create(cls, name, config=None, provide=None, share_objects=True, build=True):
         """Creates a module by looking up a `name` in the module registry corresponding to the calling class' module type.
         `config` and `provide` are passed to the module's constructor.
 
@@ -217,18 +266,86 @@ class ModuleBase:
         - any instantiated module objects will be cached in the registry based on their configs
         - when a module with the same config is created, the cached object is returned rather than a new instance
         This behavior applies to any module dependencies as well.
+        Shared objects are held in `module_registry.shared_objects`, which can be bounded (see `SharedObjectCache`).
+        If another thread is creating a module with the same config, `create` waits for it and returns its object.
+        Modules created in a `constants.scope` that changes CACHE_BASE_PATH or CACHE_LAYOUT are only shared within that cache location.
+
+        If `build` is false, neither the module nor its dependencies will have their `build` method called.
+        Unbuilt objects are never shared, so `share_objects` is ignored in this case.
         """
 
         module_cls = module_registry.lookup(cls.module_type, name)
-        module_obj = module_cls(config, provide, share_dependency_objects=share_objects)
+        share_objects = share_objects and build
+        with trace.span("create", "module", module=f"{module_cls.module_type}={name}") as create_span, _parallel_builds(build):
+            # a module created as a dependency of another module was already resolved along with that module
+            resolved = _take_resolution(module_cls)
+            if share_objects:
+                # look for a shared object before constructing anything, so that a shared module's graph is only constructed
+                # and built once. resolving may add entries to provide, so it receives a copy
+                if resolved is None:
+                    _, resolve_provide = cls._prepare_config_and_provide(None, provide)
+                    resolved = module_cls.resolve(config, dict(resolve_provide))
+                key = _shared_object_key(resolved.config)
+                # if another thread is creating the same module, wait for it rather than constructing and building it again
+                reservation = module_registry.shared_objects.reserve(key)
+            else:
+                reservation = nullcontext()
+
+            with reservation as shared_obj:
+                if shared_obj is not None:
+                    _use_shared_object(key, shared_obj)
+                    # the object may have been created by a pipeline in another thread or task that has not built it yet
+                    parallel.wait_for_build(shared_obj)
+                    if create_span is not None:
+                        create_span.args["shared"] = "hit"
+                    return shared_obj
+
+                # the module's dependencies are created with their parts of the resolved module graph
+                token = _resolution.set(resolved)
+                try:
+                    module_obj = module_cls(config, provide, share_dependency_objects=share_objects, build=build)
+                finally:
+                    _resolution.reset(token)
+
+                if not share_objects:
+                    if create_span is not None:
+                        create_span.args["shared"] = "disabled"
+                    return module_obj
+
+                # modules that change their config during construction (or that another thread created at the same time)
+                # may still match a shared object
+                shared_obj = module_registry.shared_objects.setdefault(_shared_object_key(module_obj.config), module_obj)
+                if create_span is not None:
+                    create_span.args["shared"] = "miss" if shared_obj is module_obj else "hit"
+
+                if shared_obj is module_obj:
+                    return module_obj
+
+                # the new object is discarded, so there is no need to build it if its build was deferred
+                plan = parallel.current_plan()
+                if plan is not None:
+                    plan.discard(module_obj)
+
+                parallel.wait_for_build(shared_obj)
+                return shared_obj
 
-        if not share_objects:
-            return module_obj
+    @classmethod
+    async def acreate(cls, name, config=None, provide=None, share_objects=True):
+        """Like `create`, but the module graph's builds are awaited concurrently on the running event loop once the whole graph
+        has been constructed. Modules that define `async def build()` overlap their waits (e.g., for reading files), while
+        synchronous builds run in the loop's default executor. Each module is built after its dependencies.
+        """
 
-        if module_obj.config not in module_registry.shared_objects:
-            module_registry.shared_objects[module_obj.config] = module_obj
+        plan = parallel.BuildPlan()
+        try:
+            with plan:
+                module_obj = cls.create(name, config, provide, share_objects=share_objects)
+            await plan.arun()
+        except BaseException as error:
+            _discard_unbuilt(plan, error)
+            raise
 
-        return module_registry.shared_objects[module_obj.config]
+        return module_obj
 
     @classmethod
     def lookup(cls, name):
@@ -236,14 +353,59 @@ class ModuleBase:
 
     @classmethod
     def compute_config(cls, config=None, provide=None):
-        """Return this module class' effective config after taking the module's defaults, `config`, and `provide` into account."""
-        return cls(config, provide=provide, share_dependency_objects=False).config
+        """Return this module class' effective config after taking the module's defaults, `config`, and `provide` into account.
+        The config is resolved without instantiating any modules (see `resolve`).
+        """
+        return cls.resolve(config, provide).config
 
-    def __init__(self, config=None, provide=None, share_dependency_objects=False, build=True):
-        # create new objects to prevent them from being shared with other class instances
-        self._dependency_objects = {}
-        self._provided_dependency = set()
+    @classmethod
+    def resolve(cls, config=None, provide=None):
+        """Resolve the config of this module class and its dependencies without instantiating or building any modules.
+        This follows the same steps as `__init__`, including the handling of `provide`, `provide_this`, and `provide_children`,
+        so it can be used to cheaply validate a config. Returns a `ResolvedModule` describing the module graph.
+
+        Resolved modules are cached in `module_registry.config_cache` based on their class, config, and provided modules,
+        so that unchanged parts of the module graph are reused when resolving similar configs.
+        """
+
+        config, provide = cls._prepare_config_and_provide(config, provide)
+
+        key = _resolution_cache_key(cls, config, provide)
+        if key is not None:
+            cached = module_registry.config_cache.get(key)
+            if cached is not None:
+                resolved, provide_additions, _ = cached
+                provide.update(provide_additions)
+                return resolved
+
+        previously_provided = set(provide)
+
+        config["name"] = cls.module_name
+        cls._resolve_random_seed(config)
+        config = cls._validate_and_cast_config(config)
+        config = cls._fill_in_default_config_options(config)
+        config_as_strings = cls._config_values_to_strings(config)
+        dependencies, provided_dependency = cls._construct_dependencies(
+            config, provide, lambda dependency_cls, dependency_config, key: dependency_cls.resolve(dependency_config, provide)
+        )
 
+        for dependency_key, dependency_obj in dependencies.items():
+            if hasattr(cls, dependency_key) or dependency_key in _MODULE_INSTANCE_ATTRIBUTES:
+                raise PipelineConstructionError(f"would assign {dependency_obj} to self.{dependency_key} but it already exists")
+            config[dependency_key] = dependency_obj.config
+
+        resolved = ResolvedModule(cls, FrozenDict(config), config_as_strings, dependencies, provided_dependency)
+
+        # dependencies may have added entries to provide, which we need to repeat when this result is reused.
+        # we also hold references to the provided (resolved) modules, so that their ids in the cache key cannot be reused
+        if key is not None:
+            provide_additions = {k: v for k, v in provide.items() if k not in previously_provided}
+            module_registry.config_cache[key] = (resolved, provide_additions, tuple(provide.values()))
+
+        return resolved
+
+    @staticmethod
+    def _prepare_config_and_provide(config, provide):
         if isinstance(config, str):
             config = config_string_to_dict(config)
 
@@ -267,25 +429,118 @@ class ModuleBase:
         # make a copy so we don't modify the object that was passed
         config = config.copy()
 
-        config["name"] = self.module_name
-        self._set_random_seed(config)
-        self.config = self._validate_and_cast_config(config)
-        self.config = self._fill_in_default_config_options(self.config)
-        self._config_as_strings = self._config_values_to_strings(self.config)
-        self._instantiate_dependencies(self.config, provide, share_dependency_objects)
-        # freeze config
-        self.config = FrozenDict(self.config)
+        return config, provide
 
-        if build and hasattr(self, "build"):
-            self.build()
+    def __init__(self, config=None, provide=None, share_dependency_objects=False, build=True):
+        # create new objects to prevent them from being shared with other class instances
+        self._dependency_objects = {}
+        self._provided_dependency = set()
+        self._module_paths = {}
+        self._cache_paths = {}
+        self._config_digests = {}
+        resolved = _take_resolution(type(self))
+
+        # spans are only recorded while a Tracer is active
+        with trace.span("construct", "module", module=f"{self.module_type}={self.module_name}") as construct_span:
+            with trace.span("validate", "module"):
+                config, provide = self._prepare_config_and_provide(config, provide)
+
+                config["name"] = self.module_name
+                self._set_random_seed(config)
+                self.config = self._validate_and_cast_config(config)
+                self.config = self._fill_in_default_config_options(self.config)
+                self._config_as_strings = self._config_values_to_strings(self.config)
+
+            with _parallel_builds(build):
+                self._instantiate_dependencies(self.config, provide, share_dependency_objects, build, resolved)
+                # freeze config
+                self.config = FrozenDict(self.config)
+
+                if build and hasattr(self, "build"):
+                    plan = parallel.current_plan()
+                    if plan is not None:
+                        plan.add(self, construct_span)
+                    else:
+                        self._run_build()
+
+            if construct_span is not None:
+                construct_span.args["module_path"] = self.get_module_path()
+
+    def _run_build(self, parent_span=None):
+        """Call `build`, holding the module's build lock if the BUILD_LOCK constant is set.
+        Async builds are run to completion on an event loop (see `run_coroutine`)."""
+
+        if self.lock_build and "BUILD_LOCK" in constants:
+            lock_dir = constants["CACHE_BASE_PATH"] / ".locks" if constants["BUILD_LOCK"] == "file" else None
+            with trace.span("build", "module", parent=parent_span, lock=constants["BUILD_LOCK"]):
+                with build_lock(self.config_digest(), constants["BUILD_LOCK"], lock_dir):
+                    self._call_build()
+        else:
+            with trace.span("build", "module", parent=parent_span):
+                self._call_build()
+
+    def _call_build(self):
+        result = self.build()
+        if inspect.isawaitable(result):
+            parallel.run_coroutine(result)
+
+    async def _arun_build(self, parent_span=None):
+        """Await `build` on the running event loop (see `BuildPlan.arun`)"""
+
+        # waiting for a build lock would block the event loop, so builds that need one run in a thread like synchronous builds
+        if not inspect.iscoroutinefunction(self.build) or (self.lock_build and "BUILD_LOCK" in constants):
+            import asyncio
+
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(None, context.run, self._run_build, parent_span)
+            return
+
+        with trace.span("build", "module", parent=parent_span):
+            await self.build()
+
+    def _instantiate_dependencies(self, config, provide, share_objects, build=True, resolved=None):
+        def create(dependency_cls, dependency_config, key):
+            # pass the dependency's part of this module's resolved graph to create, so it does not resolve the dependency again
+            token = _resolution.set(resolved._dependency_objects.get(key) if resolved is not None else None)
+            try:
+                return dependency_cls.create(
+                    dependency_cls.module_name, dependency_config, provide=provide, share_objects=share_objects, build=build
+                )
+            finally:
+                _resolution.reset(token)
+
+        with trace.span("dependencies", "module") as dependencies_span:
+            dependencies, self._provided_dependency = self._construct_dependencies(config, provide, create)
+
+            if dependencies_span is not None:
+                dependencies_span.args["keys"] = [dependency.key for dependency in self.dependencies]
+                dependencies_span.args["provided"] = {
+                    key: f"{dependencies[key].module_type}={dependencies[key].module_name}" for key in self._provided_dependency
+                }
+                dependencies_span.args["created"] = [key for key in dependencies if key not in self._provided_dependency]
+
+        # add dependency configs and objects to self
+        for module_name, module_obj in dependencies.items():
+            if hasattr(self, module_name):  # and getattr(self, module_name) != module_obj:
+                raise PipelineConstructionError(f"would assign {module_obj} to self.{module_name} but it already exists")
+
+            setattr(self, module_name, module_obj)
+            self._dependency_objects[module_name] = module_obj
+            self.config[module_name] = module_obj.config
+
+    @classmethod
+    def _construct_dependencies(cls, config, provide, construct):
+        """Return a dict mapping dependency keys to objects and a set containing the keys of provided dependencies.
+        Dependencies that are not in `provide` are constructed by calling `construct(dependency_cls, dependency_config, key)`.
+        """
 
-    def _instantiate_dependencies(self, config, provide, share_objects):
         dependencies = {}
-        for dependency in self.dependencies:
+        provided_dependency = set()
+        for dependency in cls.dependencies:
             # if the dependency object has been provided, use it directly
             if dependency.key in provide:
                 dependencies[dependency.key] = provide[dependency.key]
-                self._provided_dependency.add(dependency.key)
+                provided_dependency.add(dependency.key)
 
                 if dependency.key in config:
                     logger.warning(
@@ -312,9 +567,7 @@ class ModuleBase:
             dependency_cls = module_registry.lookup(dependency.module, dependency_name)
 
             # instantiate the dependency
-            dependencies[dependency.key] = dependency_cls.create(
-                dependency_name, dependency_config, provide=provide, share_objects=share_objects
-            )
+            dependencies[dependency.key] = construct(dependency_cls, dependency_config, dependency.key)
 
             # provide the dependency for later modules?
             if dependency.provide_this:
@@ -338,51 +591,134 @@ class ModuleBase:
 
                 provide[child_dep_key] = getattr(dependencies[dependency.key], child_dep_key)
 
-        # add dependency configs and objects to self
-        for module_name, module_obj in dependencies.items():
-            if hasattr(self, module_name):  # and getattr(self, module_name) != module_obj:
-                raise PipelineConstructionError(f"would assign {module_obj} to self.{module_name} but it already exists")
-
-            setattr(self, module_name, module_obj)
-            self._dependency_objects[module_name] = module_obj
-            self.config[module_name] = module_obj.config
+        return dependencies, provided_dependency
 
     def _set_random_seed(self, config):
         """If this module requires a random seed, set one and initialize the RNGs.
 
         All modules must share the same seed, because they may make calls to the same RNGs (e.g., ``np.random``).
         However, this can lead to non-deterministic behavior and should be avoided whenever possible.
-        Instead, modules should use their own numpy RNG at `self.rng` to avoid RNG interactions between modules."""
+        Instead, modules should use their own numpy RNG at `self.rng` to avoid RNG interactions between modules.
+        This is required for pipelines with different seeds in the same process (see `ConstantsRegistry.scope`),
+        because the global RNGs are shared by every scope."""
 
-        if not self.requires_random_seed:
-            return
+        if self._resolve_random_seed(config):
+            import numpy as np
 
-        # must use the same seed for all modules
+            self.rng = np.random.Generator(np.random.PCG64(constants["RANDOM_SEED"]))
+
+    @classmethod
+    def _resolve_random_seed(cls, config):
+        """If this module requires a random seed, set the seed in `config` and return True.
+        The first module to do so determines the seed (stored in `constants`) and initializes the global RNGs."""
+
+        if not cls.requires_random_seed:
+            return False
+
+        # must use the same seed for all modules (in the current constants scope)
         if "RANDOM_SEED" not in constants:
             constants["RANDOM_SEED"] = int(config.get("seed", _DEFAULT_RANDOM_SEED))
+            # numpy is imported here rather than at the top of the file, because it is slow to import and only needed for RNGs
+            import numpy as np
+
             random.seed(constants["RANDOM_SEED"])
             np.random.seed(constants["RANDOM_SEED"])
 
-        self.rng = np.random.Generator(np.random.PCG64(constants["RANDOM_SEED"]))
         config["seed"] = constants["RANDOM_SEED"]
+        return True
+
+    def estimate_memory_size(self):
+        """Return an estimate of the memory (in bytes) used by this module object, not including its dependencies.
+        This is used to enforce the memory budget of `module_registry.shared_objects`. Modules that hold large objects should override it.
+        """
+
+        return 0
 
     def get_cache_path(self, *args, **kwargs):
         """Return an absolute path that can be used for caching.
         The path is a function of the module's config and the configs of its dependencies.
+
+        By default, the path is CACHE_BASE_PATH joined with the module path (see `get_module_path`).
+        If the CACHE_LAYOUT constant is "digest", the path is CACHE_BASE_PATH/<first 2 digest characters>/<digest> instead,
+        where <digest> is the module's `config_digest`, and a sidecar <digest>.json file describing the config is written next to it.
+        With the digest layout, an existing cache directory using the module path layout is returned if the digest path does not exist.
+
+        If the CACHE_CATALOG constant is set, the path is recorded in the `CacheCatalog` stored in that file.
         """
 
-        return constants["CACHE_BASE_PATH"] / self.get_module_path(*args, **kwargs)
+        module_path = self.get_module_path(*args, **kwargs)
+        base_path = constants["CACHE_BASE_PATH"]
+        layout = constants["CACHE_LAYOUT"] if "CACHE_LAYOUT" in constants else "path"
+
+        cached = self._cache_paths.get((module_path, layout))
+        if cached is None or cached[0] is not base_path:
+            if layout == "path":
+                path = base_path / module_path
+            elif layout == "digest":
+                path = self._digest_cache_path(base_path, module_path, *args, **kwargs)
+            else:
+                raise ValueError(f"unknown CACHE_LAYOUT '{layout}'; expected 'path' or 'digest'")
+
+            cached = (base_path, path)
+            self._cache_paths[(module_path, layout)] = cached
+
+            if "CACHE_CATALOG" in constants:
+                from profane.catalog import record_cache_path
+
+                record_cache_path(self, path)
+
+        return cached[1]
+
+    def _digest_cache_path(self, base_path, module_path, skip_config_keys=None):
+        digest = self.config_digest(skip_config_keys=skip_config_keys)
+        path = base_path / digest[:2] / digest
+
+        if not path.exists() and _path_exists(base_path / module_path):
+            return base_path / module_path
+
+        sidecar = path.parent / (digest + ".json")
+        if not sidecar.exists():
+            description = {
+                "digest": digest,
+                "module_type": self.module_type,
+                "module_name": self.module_name,
+                "module_path": module_path,
+                "skip_config_keys": sorted(_skip_config_keys_key(skip_config_keys)),
+                "config": self.config._as_dict(),
+            }
+
+            # write to a temporary file first so that concurrent readers never see a partial sidecar
+            serialized = json.dumps(description, indent=2, sort_keys=True, default=str).encode("utf-8")
+            atomic_write(sidecar, lambda f: f.write(serialized))
+
+        return path
+
+    def get_array_store(self, *args, **kwargs):
+        """Return an `ArrayStore` in the module's cache path, which stores arrays that can be shared across processes as memory maps"""
+
+        return ArrayStore(self.get_cache_path(*args, **kwargs) / "arrays")
 
     def get_module_path(self, skip_config_keys=None):
-        """Return a relative path encoding the module's config and its dependencies"""
+        """Return a relative path encoding the module's config and its dependencies.
+        Paths are computed once per module and `skip_config_keys` value, and dependencies' paths are reused.
+        """
+
+        # skip_config_keys only applies to modules with dependencies
+        key = _skip_config_keys_key(skip_config_keys) if self.dependencies else frozenset()
+        path = self._module_paths.get(key)
+        if path is not None:
+            return path
 
         if self.dependencies:
             prefix = os.path.join(
                 *[self._dependency_objects[dependency.key].get_module_path() for dependency in self.dependencies]
             )
-            return os.path.join(prefix, self._this_module_path_only(skip_config_keys=skip_config_keys))
+            path = os.path.join(prefix, self._this_module_path_only(skip_config_keys=skip_config_keys))
         else:
-            return self._this_module_path_only()
+            path = self._this_module_path_only()
+
+        self._module_paths[key] = path
+        return path
 
     def _this_module_path_only(self, skip_config_keys=None):
         """Return a path encoding only the module's config (and not its dependencies)"""
@@ -401,6 +737,33 @@ class ModuleBase:
         module_name_key = self.module_type + "-" + module_cfg.pop("name")
         return "_".join([module_name_key] + [f"{k}-{v}" for k, v in sorted(module_cfg.items())])
 
+    def config_digest(self, skip_config_keys=None):
+        """Return a hex digest of the module's config and the configs of its dependencies.
+        Unlike hash(self.config), the digest is the same in every process and can be used to identify the module across workers.
+        Like the module path, it does not depend on `config_keys_not_in_path` or on this module's `skip_config_keys`.
+        """
+
+        key = _skip_config_keys_key(skip_config_keys)
+        digest = self._config_digests.get(key)
+        if digest is None:
+            module_cfg = {
+                k: self._config_as_strings[k]
+                for k in self.config
+                if k not in self._dependency_objects and k not in self.config_keys_not_in_path and k not in key
+            }
+            canonical = {
+                "module_type": self.module_type,
+                "config": module_cfg,
+                "dependencies": {
+                    dependency.key: self._dependency_objects[dependency.key].config_digest() for dependency in self.dependencies
+                },
+            }
+            serialized = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=True)
+            digest = hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+            self._config_digests[key] = digest
+
+        return digest
+
     def print_module_graph(self, prefix=""):
         childprefix = prefix + "    "
         this = f"{self.module_type}={self.module_name}"
@@ -419,6 +782,8 @@ class ModuleBase:
         print("\n".join(lines))
 
     def _config_summary(self, lines, prefix=""):
+        from colorama import Style, Fore
+
         options = {option.key: option for option in self.config_spec}
         options["name"] = ConfigOption("name", self.module_name)
         options["seed"] = ConfigOption("seed", _DEFAULT_RANDOM_SEED, "random seed")
@@ -443,7 +808,196 @@ class ModuleBase:
                 lines.append(f"{color}{prefix}{key} = {self._config_as_strings[key]}{Style.RESET_ALL}")
 
 
+# attributes set on module objects by __init__, which dependency keys may not replace
+_MODULE_INSTANCE_ATTRIBUTES = (
+    "config",
+    "rng",
+    "_config_as_strings",
+    "_dependency_objects",
+    "_provided_dependency",
+    "_module_paths",
+    "_cache_paths",
+    "_config_digests",
+)
+
+
+class ResolvedModule:
+    """A module's resolved config and dependency graph, which is computed by `ModuleBase.resolve` without instantiating the module.
+    Like a module object, it provides the module's `config`, its dependencies as attributes, module paths,
+    and methods for printing the module graph and config. Other attributes are looked up on the module class,
+    with methods bound to the resolved module; this allows methods that only describe the module to be called.
+    Dependencies are `ResolvedModule`s themselves, except for module objects that were passed in `provide`.
+    """
+
+    def __init__(self, module_cls, config, config_as_strings, dependencies, provided_dependency):
+        self.module_cls = module_cls
+        self.module_type = module_cls.module_type
+        self.module_name = module_cls.module_name
+        self.dependencies = module_cls.dependencies
+        self.config_spec = module_cls.config_spec
+        self.config_keys_not_in_path = module_cls.config_keys_not_in_path
+        self.config = config
+        self._config_as_strings = config_as_strings
+        self._dependency_objects = dependencies
+        self._provided_dependency = provided_dependency
+        self._module_paths = {}
+        self._cache_paths = {}
+        self._config_digests = {}
+
+    def __getattr__(self, key):
+        # like module objects, make dependencies available as attributes
+        dependencies = self.__dict__.get("_dependency_objects", {})
+        if key in dependencies:
+            return dependencies[key]
+
+        if "module_cls" not in self.__dict__:
+            raise AttributeError(key)
+
+        value = getattr(self.module_cls, key)
+        if inspect.isfunction(value):
+            return types.MethodType(value, self)
+        return value
+
+    def __repr__(self):
+        return f"<ResolvedModule {self.module_type}={self.module_name}>"
+
+    # describe resolved modules in the same way as module objects
+    get_cache_path = ModuleBase.get_cache_path
+    _digest_cache_path = ModuleBase._digest_cache_path
+    config_digest = ModuleBase.config_digest
+    get_module_path = ModuleBase.get_module_path
+    _this_module_path_only = ModuleBase._this_module_path_only
+    print_module_graph = ModuleBase.print_module_graph
+    print_module_config = ModuleBase.print_module_config
+    _config_summary = ModuleBase._config_summary
+
+
+# the ResolvedModule of the module that is about to be created or constructed, if it has already been resolved
+# (e.g., as part of the module graph of the module that depends on it). see _take_resolution
+_resolution = contextvars.ContextVar("profane_resolution", default=None)
+
+
+def _take_resolution(module_cls):
+    """Return the resolved module set by `create` for the module of class `module_cls` that is being created, if any.
+    The resolution is only used once, so modules created while constructing this one (e.g., in an overridden __init__)
+    resolve their own configs."""
+
+    resolved = _resolution.get()
+    if resolved is None:
+        return None
+
+    _resolution.set(None)
+    return resolved if getattr(resolved, "module_cls", None) is module_cls else None
+
+
+# constants that determine where modules' caches are. modules are not shared with scopes that override these,
+# because a module's cache path would point somewhere other than where it was built
+_CACHE_LOCATION_CONSTANTS = ("CACHE_BASE_PATH", "CACHE_LAYOUT")
+
+
+def _shared_object_key(config):
+    """Return the key of a module with `config` in `module_registry.shared_objects`.
+    Within a `constants.scope` that moves the cache, the key also includes the cache location."""
+
+    overrides = constants.overrides(_CACHE_LOCATION_CONSTANTS)
+    return (config, overrides) if overrides else config
+
+
+def _use_shared_object(key, obj):
+    """Mark a shared object and its dependencies as used, in the same order as if its module graph had been created again"""
+
+    for dependency_key, dependency_obj in obj._dependency_objects.items():
+        if dependency_key not in obj._provided_dependency:
+            _use_shared_object(_shared_object_key(dependency_obj.config), dependency_obj)
+
+    module_registry.shared_objects.get(key)
+
+
+@contextmanager
+def _parallel_builds(build, workers=None):
+    """If `workers` (by default, the BUILD_WORKERS constant) is greater than 1, defer the builds of modules constructed in the body
+    and then run them in parallel (see `BuildPlan`). Does nothing if builds are already being deferred by an enclosing module."""
+
+    if workers is None and "BUILD_WORKERS" in constants:
+        workers = constants["BUILD_WORKERS"]
+
+    if not build or parallel.current_plan() is not None or workers is None or workers <= 1:
+        yield
+        return
+
+    plan = parallel.BuildPlan()
+    try:
+        with plan:
+            yield
+        plan.run(workers)
+    except BaseException as error:
+        _discard_unbuilt(plan, error)
+        raise
+
+
+def _discard_unbuilt(plan, error):
+    # unbuilt modules must not be reused, and anything waiting for them to be built needs to stop waiting
+    plan.abort(error)
+    for module in plan.unbuilt:
+        module_registry.shared_objects.discard(_shared_object_key(module.config), module)
+
+
+def _resolution_cache_key(module_cls, config, provide):
+    """Return a key identifying the inputs to `ModuleBase.resolve`, or None if the result should not be cached.
+    Provided modules are identified by their identities rather than their configs.
+
+    Resolutions that are provided module objects (rather than `ResolvedModule`s) are not cached, because the resolved graph
+    refers to the provided objects, and holding them in `config_cache` would keep them alive after the shared object cache
+    has evicted them.
+    """
+
+    if any(isinstance(obj, ModuleBase) for obj in provide.values()):
+        return None
+
+    seed = constants["RANDOM_SEED"] if "RANDOM_SEED" in constants else None
+
+    try:
+        return (module_cls, seed, _typed_freeze(config), frozenset((k, id(v)) for k, v in provide.items()))
+    except TypeError:
+        return None
+
+
+def _skip_config_keys_key(skip_config_keys):
+    """Return a hashable key identifying the `skip_config_keys` argument of `ModuleBase.get_module_path`"""
+
+    if skip_config_keys is None:
+        return frozenset()
+    if isinstance(skip_config_keys, str):
+        return frozenset([skip_config_keys])
+    return frozenset(skip_config_keys)
+
+
+def _path_exists(path):
+    # module paths can exceed the maximum path length, in which case they cannot exist
+    try:
+        return path.exists()
+    except OSError:
+        return False
+
+
+def _typed_freeze(value):
+    """Return a hashable version of `value` that also encodes the type of each item.
+    Unlike a FrozenDict, this distinguishes between configs like {'x': 1} and {'x': True}, which may be cast differently."""
+
+    if isinstance(value, collections.abc.Mapping):
+        return frozenset((k, _typed_freeze(v)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return (type(value), tuple(_typed_freeze(item) for item in value))
+
+    hash(value)
+    return (type(value), value)
+
+
 def import_all_modules(file, package):
+    # modules covered by the manifest in use are imported on demand by module_registry.lookup instead
+    if module_registry.covers_package(package):
+        return
+
     pwd = os.path.dirname(file)
     for fn in glob(os.path.join(pwd, "*.py")):
         module_name = os.path.basename(fn)[:-3]
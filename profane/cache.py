@@ -0,0 +1,490 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class LRUCache:
+    """A dict-like cache that holds at most `maxsize` entries (or unlimited entries if `maxsize` is None).
+    When the cache is full, the least recently used entry is evicted. Hits, misses, and evictions are counted.
+    The cache can be used from multiple threads.
+    """
+
+    def __init__(self, maxsize=None):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f"invalid maxsize: {maxsize}")
+
+        self.maxsize = maxsize
+        self._d = OrderedDict()
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the value for `key` (marking it as recently used) or `default` if `key` is not present"""
+
+        with self._lock:
+            try:
+                value = self._d[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._d.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._d[key] = value
+            self._d.move_to_end(key)
+
+            while self.maxsize is not None and len(self._d) > self.maxsize:
+                self._d.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._d[key]
+
+    def __contains__(self, key):
+        return key in self._d
+
+    def __len__(self):
+        return len(self._d)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._d))
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self), "maxsize": self.maxsize}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.stats()}>"
+
+
+class SharedObjectCache:
+    """Holds the module objects shared by `ModuleBase.create`, keyed by their configs.
+
+    The `maxsize` most recently used objects are held with strong references. If `max_bytes` is set, objects are
+    also evicted from this set until their combined size (as reported by their `estimate_memory_size` method) fits
+    within the budget. Every object is also held with a weak reference, so an evicted object remains available
+    for as long as something else refers to it (e.g., a pipeline that is still in use). This means that evicting
+    an object never results in two live objects with the same config.
+
+    With the default arguments, objects are held forever. With `maxsize=0`, objects are only held by weak references.
+    The cache can be used from multiple threads (e.g., to create pipelines in several `constants.scope`s at once).
+    """
+
+    def __init__(self, maxsize=None, max_bytes=None):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f"invalid maxsize: {maxsize}")
+
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._strong = OrderedDict()
+        self._sizes = {}
+        self._weak = weakref.WeakValueDictionary()
+        self._lock = threading.RLock()
+        # keys whose objects are being created, mapped to the creating thread and an event that is set once it finishes
+        self._creating = {}
+        # the key that each thread is waiting for another thread to create
+        self._waiting_for = {}
+        self.bytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the object for `key` (marking it as recently used) or `default` if `key` is not present"""
+
+        with self._lock:
+            obj = self._lookup(key)
+            if obj is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._hold(key, obj)
+            return obj
+
+    def peek(self, key, default=None):
+        """Return the object for `key` or `default` if `key` is not present, without marking it as used"""
+
+        with self._lock:
+            obj = self._lookup(key)
+            return default if obj is None else obj
+
+    def setdefault(self, key, obj):
+        """Return the object for `key` (marking it as recently used) if `key` is present. Otherwise, add `obj` and return it.
+        Unlike calling `get` and then assigning `obj`, this cannot add a second object for `key` when called from several threads.
+        """
+
+        with self._lock:
+            existing = self.get(key)
+            if existing is not None:
+                return existing
+
+            self[key] = obj
+            return obj
+
+    def _lookup(self, key):
+        obj = self._strong.get(key)
+        if obj is None:
+            obj = self._weak.get(key)
+        return obj
+
+    def __getitem__(self, key):
+        obj = self.get(key, _MISSING)
+        if obj is _MISSING:
+            raise KeyError(key)
+        return obj
+
+    def __setitem__(self, key, obj):
+        with self._lock:
+            try:
+                self._weak[key] = obj
+            except TypeError:
+                # the object does not support weak references, so it is only available while it is strongly held
+                pass
+
+            self._hold(key, obj)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._strong or key in self._weak
+
+    def __len__(self):
+        with self._lock:
+            return len(set(self._strong) | set(self._weak))
+
+    def clear(self):
+        with self._lock:
+            self._strong.clear()
+            self._sizes.clear()
+            self._weak.clear()
+            self.bytes = 0
+
+    def discard(self, key, obj):
+        """Remove `key` if it refers to `obj` (e.g., because `obj` failed to build)"""
+
+        with self._lock:
+            if self._strong.get(key) is obj:
+                del self._strong[key]
+                self.bytes -= self._sizes.pop(key)
+
+            if self._weak.get(key) is obj:
+                del self._weak[key]
+
+    @contextmanager
+    def reserve(self, key):
+        """Wait until no other thread is creating an object for `key`. Yields the object for `key` if there is one.
+        Otherwise, yields None and reserves `key` until the block exits, so that other threads wait for the object to be
+        created (and added to the cache) rather than creating another one.
+
+        A thread does not wait for a key reserved by a thread that is (indirectly) waiting for it, because neither would finish.
+        In this case, None is yielded without reserving the key, so both threads create an object and the first one added is shared.
+        """
+
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                obj = self._lookup(key)
+                if obj is not None:
+                    reserved = False
+                    break
+
+                creating = self._creating.get(key)
+                if creating is None:
+                    self._creating[key] = (me, threading.Event())
+                    reserved = True
+                    break
+
+                owner, finished = creating
+                if self._would_deadlock(owner, me):
+                    reserved = False
+                    break
+
+                self._waiting_for[me] = key
+
+            try:
+                finished.wait()
+            finally:
+                with self._lock:
+                    del self._waiting_for[me]
+
+        try:
+            yield obj
+        finally:
+            if reserved:
+                with self._lock:
+                    _, finished = self._creating.pop(key)
+                    finished.set()
+
+    def _would_deadlock(self, owner, me):
+        seen = set()
+        while owner not in seen:
+            if owner == me:
+                return True
+
+            seen.add(owner)
+            key = self._waiting_for.get(owner)
+            if key not in self._creating:
+                return False
+            owner = self._creating[key][0]
+
+        return False
+
+    def _hold(self, key, obj):
+        if key in self._strong:
+            self._strong.move_to_end(key)
+            return
+
+        size = obj.estimate_memory_size() if hasattr(obj, "estimate_memory_size") else 0
+        self._strong[key] = obj
+        self._sizes[key] = size
+        self.bytes += size
+
+        while self._strong and (
+            (self.maxsize is not None and len(self._strong) > self.maxsize)
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            evicted_key, _ = self._strong.popitem(last=False)
+            self.bytes -= self._sizes.pop(evicted_key)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "held": len(self._strong),
+            "live": len(self),
+            "bytes": self.bytes,
+            "maxsize": self.maxsize,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.stats()}>"
+
+
+class PickleSerializer:
+    extension = "pkl"
+
+    def dump(self, obj, f):
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, f):
+        return pickle.load(f)
+
+
+class NpySerializer:
+    """Serializes a single NumPy array in .npy format"""
+
+    extension = "npy"
+
+    def dump(self, obj, f):
+        import numpy as np
+
+        np.save(f, obj, allow_pickle=False)
+
+    def load(self, f):
+        import numpy as np
+
+        return np.load(f, allow_pickle=False)
+
+
+class MemmapSerializer(NpySerializer):
+    """Serializes a single NumPy array in .npy format and loads it as a read-only memory map (see `ArrayStore`)"""
+
+    def load_path(self, path):
+        import numpy as np
+
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+
+
+class JSONSerializer:
+    extension = "json"
+
+    def dump(self, obj, f):
+        f.write(json.dumps(obj, sort_keys=True).encode("utf-8"))
+
+    def load(self, f):
+        return json.loads(f.read().decode("utf-8"))
+
+
+# serializers that can be referred to by name in `cached`. other objects with `extension`, `dump`, and `load` attributes can also be used.
+serializers = {"pickle": PickleSerializer(), "npy": NpySerializer(), "memmap": MemmapSerializer(), "json": JSONSerializer()}
+
+
+def cached(method=None, serializer="pickle"):
+    """Decorator that caches the results of a module method in memory and under the module's cache path.
+
+    Results are stored in `self.get_cache_path() / "cached"` in a file named after the method and a digest of its arguments,
+    so they are reused by any module object with the same config (including objects in other processes).
+    Files are written to a temporary file and then renamed, so a partially-written result is never loaded.
+    The result is also kept in memory for the life of the module object.
+
+    Arguments must be JSON-serializable (or have a stable repr) so that they can be used in the filename.
+    `serializer` is "pickle", "npy", "memmap", "json" (see `serializers`), or an object with `extension`, `dump(obj, f)`, and `load(f)` attributes.
+    Serializers with a `load_path(path)` method load results from their paths instead, and are also used to load results
+    that were just computed. With "memmap", the result is a read-only memory map of the cached array.
+
+    Usage: decorate a method with @cached or @cached(serializer="npy")
+    """
+
+    if method is None:
+        return functools.partial(cached, serializer=serializer)
+
+    serializer = serializers[serializer] if isinstance(serializer, str) else serializer
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]
+
+        filename = method.__name__
+        if arguments:
+            filename += "-" + _arguments_digest(arguments)
+
+        memo = self.__dict__.setdefault("_cached_results", {})
+        if filename in memo:
+            return memo[filename]
+
+        path = self.get_cache_path() / "cached" / f"{filename}.{serializer.extension}"
+        if not path.exists():
+            result = method(self, *args, **kwargs)
+            atomic_write(path, lambda f: serializer.dump(result, f))
+            _record_cached_result(self, path)
+
+            if not hasattr(serializer, "load_path"):
+                memo[filename] = result
+                return result
+
+        if hasattr(serializer, "load_path"):
+            result = serializer.load_path(path)
+        else:
+            with open(path, "rb") as f:
+                result = serializer.load(f)
+
+        memo[filename] = result
+        return result
+
+    return wrapper
+
+
+class ArrayStore:
+    """Stores NumPy arrays as .npy files in a directory and loads them as read-only memory maps.
+
+    Memory-mapped arrays are backed by the page cache, so processes on the same host that load the same array share one copy
+    of it in memory (rather than each process reading a private copy with np.load). Arrays are written atomically,
+    so concurrent readers never see a partially-written array. See `ModuleBase.get_array_store`.
+    """
+
+    serializer = MemmapSerializer()
+
+    def __init__(self, path):
+        self.path = path
+
+    def path_for(self, name):
+        if not name or os.sep in name or name.startswith("."):
+            raise ValueError(f"invalid array name: {name}")
+
+        return self.path / f"{name}.{self.serializer.extension}"
+
+    def __contains__(self, name):
+        return self.path_for(name).exists()
+
+    def names(self):
+        if not self.path.exists():
+            return []
+
+        suffix = "." + self.serializer.extension
+        return sorted(fn[: -len(suffix)] for fn in os.listdir(self.path) if fn.endswith(suffix) and not fn.startswith("."))
+
+    def load(self, name):
+        """Return a read-only memory map of the array `name`"""
+
+        path = self.path_for(name)
+        if not path.exists():
+            raise KeyError(name)
+
+        return self.serializer.load_path(path)
+
+    def save(self, name, array):
+        """Store `array` as `name` (replacing any existing array) and return a read-only memory map of it"""
+
+        path = self.path_for(name)
+        atomic_write(path, lambda f: self.serializer.dump(array, f))
+        return self.serializer.load_path(path)
+
+    def get_or_compute(self, name, compute):
+        """Return a memory map of the array `name`, first storing the result of `compute()` if it does not exist"""
+
+        try:
+            return self.load(name)
+        except KeyError:
+            return self.save(name, compute())
+
+    def __repr__(self):
+        return f"<ArrayStore {self.path}>"
+
+
+def atomic_write(path, write):
+    """Create `path` by calling `write(f)` on a temporary binary file in the same directory and renaming it to `path`"""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_fn = tempfile.mkstemp(dir=path.parent, prefix=".tmp-" + path.name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_fn, path)
+    except BaseException:
+        os.unlink(tmp_fn)
+        raise
+
+
+def _arguments_digest(arguments):
+    serialized = json.dumps(arguments, sort_keys=True, default=repr)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+
+def _record_cached_result(module, path):
+    # add the size of the file at `path` to the size of the module's cache path in the cache catalog, if one is used
+    from profane.base import constants
+
+    if "CACHE_CATALOG" in constants:
+        from profane.catalog import record_cache_path
+
+        record_cache_path(module, module.get_cache_path(), added_size=os.path.getsize(path))
+
+
+_MISSING = object()
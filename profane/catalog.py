@@ -0,0 +1,215 @@
+import datetime
+import logging
+import os
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from profane.sql import DBManager
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+Base = declarative_base()
+
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entry"
+
+    entry_id = sa.Column(sa.Integer, primary_key=True)
+    path = sa.Column(sa.String, nullable=False, unique=True)
+    module_type = sa.Column(sa.String)
+    module_name = sa.Column(sa.String)
+    # flattened config, e.g. {"name": "bm25", "k1": "0.9", "index.name": "anserini", ...}
+    config = sa.Column(sa.JSON)
+
+    # size in bytes of the file or directory at path, or None if it did not exist when the entry was last updated
+    size = sa.Column(sa.BigInteger)
+    access_time = sa.Column(sa.DateTime(timezone=True))
+
+    idx1 = sa.Index("idx_module_type_name", module_type, module_name)
+
+    def __repr__(self):
+        return f"<CacheEntry {self.module_type}={self.module_name} path={self.path}>"
+
+
+class CacheEntryOption(Base):
+    """One config option of a `CacheEntry`, which allows entries to be looked up by their config"""
+
+    __tablename__ = "cache_entry_option"
+
+    entry_id = sa.Column(sa.Integer, sa.ForeignKey("cache_entry.entry_id", ondelete="CASCADE"), primary_key=True)
+    key = sa.Column(sa.String, primary_key=True)
+    value = sa.Column(sa.String)
+
+    idx1 = sa.Index("idx_key_value", key, value, entry_id)
+
+
+class CacheCatalog:
+    """Catalog of module cache paths stored in a local SQLite database.
+
+    Each entry records a path returned by `ModuleBase.get_cache_path` along with the module's type, name, and flattened config,
+    the size of the path, and when it was last recorded. This allows cached artifacts to be found by their configs without
+    walking the cache directory. When the CACHE_CATALOG constant is set to the catalog's filename, cache paths are recorded
+    automatically the first time each module's `get_cache_path` is called in a process. At that point the path often does not
+    exist yet, so sizes are None until `record` or `refresh` is called after the cache has been written. Results written by
+    `@cached` methods add their file sizes to the entry as they are written. Automatic recording never walks the cache directory.
+
+    Config values are flattened to keys like "index.stemmer" and compared as strings, in the form they take in module paths.
+    """
+
+    def __init__(self, filename, sqlite_timeout=60):
+        self.filename = os.fspath(filename)
+        engine = DBManager._create_sqlite_engine(sa.engine.make_url(f"sqlite:///{self.filename}"), sqlite_timeout)
+
+        @sa.event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+        Base.metadata.create_all(engine)
+        self.engine = engine
+        self.sessionmaker = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def record(self, module, path=None, measure=True, added_size=0):
+        """Add or update the entry for `module`'s cache path (or for `path`, which is a cache path of `module`).
+        Returns the entry's id.
+
+        If `measure` is false, the path is not walked to find its size, because that gets slow as caches grow. Instead, the
+        entry keeps the size it already had plus `added_size` bytes (e.g., the size of a file that was just written under the path).
+        `refresh` measures every entry again.
+        """
+
+        path = os.fspath(path if path is not None else module.get_cache_path())
+        config = flatten_module_config(module)
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        if measure:
+            size = _path_size(path)
+        else:
+            size = added_size if added_size else None
+
+        upsert = sqlite_insert(CacheEntry.__table__).values(
+            path=path, module_type=module.module_type, module_name=module.module_name, config=config, size=size, access_time=now
+        )
+        if measure:
+            updated_size = upsert.excluded.size
+        elif added_size:
+            updated_size = sa.func.coalesce(CacheEntry.size, 0) + added_size
+        else:
+            updated_size = CacheEntry.size
+
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[CacheEntry.path], set_={"size": updated_size, "access_time": upsert.excluded.access_time}
+        ).returning(CacheEntry.entry_id)
+
+        with self.engine.begin() as conn:
+            entry_id = conn.execute(upsert).scalar_one()
+            options = [{"entry_id": entry_id, "key": key, "value": value} for key, value in config.items()]
+            conn.execute(sqlite_insert(CacheEntryOption.__table__).on_conflict_do_nothing(), options)
+
+        return entry_id
+
+    def find(self, module_type=None, module_name=None, config=None, materialized=False):
+        """Return the entries matching a `module_type`, `module_name`, and `config` (each of which is optional).
+        `config` is a dict of flattened config options that must match, such as {"stemmer": "porter", "collection.name": "robust04"}.
+        If `materialized` is true, only entries whose paths existed when they were last updated are returned.
+        """
+
+        query = sa.select(CacheEntry)
+        if module_type is not None:
+            query = query.where(CacheEntry.module_type == module_type)
+        if module_name is not None:
+            query = query.where(CacheEntry.module_name == module_name)
+        if materialized:
+            query = query.where(CacheEntry.size.is_not(None))
+
+        # each option is looked up with idx_key_value, so queries do not scan every entry of a module type
+        for key, value in (config or {}).items():
+            matching = sa.select(CacheEntryOption.entry_id).where(
+                CacheEntryOption.key == key, CacheEntryOption.value == str(value)
+            )
+            query = query.where(CacheEntry.entry_id.in_(matching))
+
+        with self.session_scope() as session:
+            return session.scalars(query.order_by(CacheEntry.entry_id)).all()
+
+    def refresh(self, prune=False):
+        """Update the size of every entry. If `prune` is true, entries whose paths no longer exist are removed instead."""
+
+        with self.session_scope() as session:
+            for entry in session.scalars(sa.select(CacheEntry)):
+                entry.size = _path_size(entry.path)
+                if prune and entry.size is None:
+                    session.delete(entry)
+
+    def remove(self, path):
+        with self.session_scope() as session:
+            session.execute(sa.delete(CacheEntry).where(CacheEntry.path == os.fspath(path)))
+
+    @contextmanager
+    def session_scope(self):
+        """Provide a transactional scope around a series of operations."""
+        session = self.sessionmaker()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+def flatten_module_config(module, prefix=""):
+    """Return a dict mapping dotted config keys (e.g., "index.stemmer") to their values as strings, for `module` and its dependencies"""
+
+    flattened = {}
+    for key in module.config:
+        if key in module._dependency_objects:
+            flattened.update(flatten_module_config(module._dependency_objects[key], prefix=prefix + key + "."))
+        else:
+            flattened[prefix + key] = module._config_as_strings[key]
+
+    return flattened
+
+
+def _path_size(path):
+    if not os.path.exists(path):
+        return None
+
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for fn in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, fn))
+            except OSError:
+                # the file was removed while we were walking the directory
+                pass
+
+    return size
+
+
+_catalogs = {}
+
+
+def record_cache_path(module, path, added_size=0):
+    """Record `path` in the catalog given by the CACHE_CATALOG constant (see `CacheCatalog`) without measuring its size"""
+
+    from profane.base import constants
+
+    filename = os.fspath(constants["CACHE_CATALOG"])
+    # connections cannot be shared with forked processes, so each process opens its own catalog
+    key = (os.getpid(), filename)
+    if key not in _catalogs:
+        _catalogs[key] = CacheCatalog(filename)
+
+    try:
+        _catalogs[key].record(module, path, measure=False, added_size=added_size)
+    except sa.exc.SQLAlchemyError:
+        logger.exception("failed to record %s in cache catalog %s", path, filename)
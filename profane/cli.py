@@ -1,6 +1,5 @@
 import os
 from shlex import shlex
-import yaml
 import collections
 
 
@@ -31,6 +30,8 @@ def _recursive_update(ori_dict, new_dict):
 
 
 def _load_yaml(fn):
+    import yaml
+
     with open(fn) as f:
         config = yaml.safe_load(f)
     return config
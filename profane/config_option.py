@@ -1,7 +1,5 @@
 from functools import partial
 
-import numpy as np
-
 from profane.exceptions import InvalidModuleError
 
 
@@ -90,6 +88,8 @@ def _parse_string_as_range(s, item_type):
     if item_type == int:
         return list(range(start, stop + step, step))
     elif item_type == float:
+        import numpy as np
+
         precision = max(_rounding_precision(x) for x in (start, stop, step))
         lst = [round(item, precision) for item in np.arange(start, stop + step, step)]
         if lst[-1] > stop:
@@ -1,30 +1,73 @@
+import contextvars
+from contextlib import contextmanager
+
+
 class ConstantsRegistry:
     """Write-once registry that keeps track of constants shared by modules.
     ConstantsRegistry behaves like a dict, but keys can only be assigned to once.
+
+    Constants can be overridden within a `with constants.scope(RANDOM_SEED=7, ...)` block. Scopes are context-local
+    (using contextvars), so threads and asyncio tasks can each use their own scope to build differently-configured pipelines
+    side by side. Constants assigned inside a scope are only visible within that scope.
     """
 
     def __init__(self):
+        self._scope = contextvars.ContextVar(f"profane_constants_{id(self)}", default=None)
         self.reset()
 
     def reset(self):
+        """Remove all constants that were assigned outside of a scope"""
         self._d = {}
 
+    def _current(self):
+        scoped = self._scope.get()
+        return self._d if scoped is None else {**self._d, **scoped}
+
+    @contextmanager
+    def scope(self, **constants):
+        """Override `constants` (and any constants assigned inside the `with` block) until the block exits.
+        Nested scopes start with the constants of the enclosing scope."""
+
+        parent = self._scope.get()
+        token = self._scope.set({**(parent or {}), **constants})
+        try:
+            yield self
+        finally:
+            self._scope.reset(token)
+
+    def overrides(self, keys):
+        """Return (key, value) pairs for the constants in `keys` that the current scope sets to a different value than
+        they have outside of any scope"""
+
+        scoped = self._scope.get()
+        if not scoped:
+            return ()
+        return tuple((key, scoped[key]) for key in keys if key in scoped and (key not in self._d or self._d[key] != scoped[key]))
+
     def __getitem__(self, key):
+        scoped = self._scope.get()
+        if scoped is not None and key in scoped:
+            return scoped[key]
         return self._d[key]
 
     def __setitem__(self, key, val):
-        if key in self._d and self._d[key] != val:
+        if key in self and self[key] != val:
             raise TypeError(
-                f"ConstantsRegistry does not support re-assignment of existing entries; already contains: {key}={self._d[key]}"
+                f"ConstantsRegistry does not support re-assignment of existing entries; already contains: {key}={self[key]}"
             )
-        else:
+
+        scoped = self._scope.get()
+        if scoped is None:
             self._d[key] = val
+        else:
+            scoped[key] = val
 
     def __repr__(self):
-        return repr(self._d)
+        return repr(self._current())
 
     def __len__(self):
-        return len(self._d)
+        return len(self._current())
 
     def __contains__(self, item):
-        return item in self._d
+        scoped = self._scope.get()
+        return item in self._d or (scoped is not None and item in scoped)
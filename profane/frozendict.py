@@ -1,15 +1,50 @@
 import collections
-from copy import deepcopy
+import copy
+import weakref
 
 
 class FrozenDict(collections.abc.Mapping):
-    """Based on frozen dict implementation from https://stackoverflow.com/a/2704866 by Mike Graham"""
+    """Based on frozen dict implementation from https://stackoverflow.com/a/2704866 by Mike Graham
 
-    def __init__(self, *args, **kwargs):
-        self._d = dict(*args, **kwargs)
-        _freeze_dicts(self._d)
+    Nested dicts are converted to FrozenDicts and lists are converted to tuples. Because the contents are immutable,
+    nested FrozenDicts are reused rather than copied (including when a FrozenDict is constructed from another FrozenDict).
 
-        self._hash = None
+    FrozenDicts are interned: constructing a FrozenDict with the same contents as an existing one returns the existing
+    instance, so equal (sub)configs share one object and usually compare by identity. Contents are only considered the same
+    if their keys are in the same order and their values have the same types (e.g., {'x': 1} and {'x': True} are interned
+    separately), so interning never changes a FrozenDict's iteration order. FrozenDicts with the same contents in a different
+    order are still equal.
+    The intern table holds weak references, so FrozenDicts that are no longer used are garbage collected as usual.
+    """
+
+    __slots__ = ("_d", "_hash", "__weakref__")
+
+    def __new__(cls, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], FrozenDict):
+            return args[0]
+
+        d = dict(*args, **kwargs)
+        _freeze_dicts(d)
+
+        try:
+            key = _InternKey(d)
+        except TypeError:
+            # contents are not hashable, so this FrozenDict cannot be interned (or used as a key)
+            return cls._from_dict(d, None)
+
+        obj = _interned.get(key)
+        if obj is None:
+            obj = cls._from_dict(d, key.hash)
+            _interned[key] = obj
+
+        return obj
+
+    @classmethod
+    def _from_dict(cls, d, hash_):
+        obj = super().__new__(cls)
+        obj._d = d
+        obj._hash = hash_
+        return obj
 
     def __iter__(self):
         return iter(self._d)
@@ -26,13 +61,23 @@ class FrozenDict(collections.abc.Mapping):
     def __getitem__(self, key):
         return self._d[key]
 
+    def __contains__(self, key):
+        return key in self._d
+
     def __eq__(self, other):
+        if self is other:
+            return True
+
         if isinstance(other, dict):
-            other = FrozenDict(other)
+            return _equals_dict(self._d, other)
 
         if not isinstance(other, FrozenDict):
             return False
 
+        # hashes are cached after their first use (e.g., as a dict key), so this is usually a cheap way to detect inequality
+        if self._hash is not None and other._hash is not None and self._hash != other._hash:
+            return False
+
         return self._d == other._d
 
     def __hash__(self):
@@ -40,22 +85,114 @@ class FrozenDict(collections.abc.Mapping):
             self._hash = hash(frozenset(self._d.items()))
         return self._hash
 
-    def _as_dict(self):
-        unfrozen = deepcopy(self._d)
+    def __reduce__(self):
+        # the cached hash is not pickled, because str hashes differ between processes
+        return (FrozenDict, (self._d,))
 
-        for k in list(unfrozen.keys()):
-            if isinstance(unfrozen[k], FrozenDict):
-                unfrozen[k] = unfrozen[k]._as_dict()
+    def __copy__(self):
+        return self
 
-        return unfrozen
+    def __deepcopy__(self, memo):
+        return self
+
+    def _as_dict(self):
+        return {k: _unfrozen_value(v) for k, v in self._d.items()}
 
     def unfrozen_copy(self):
         return self._as_dict()
 
 
+def _unfrozen_value(v):
+    """Return `v` if it is immutable, or a copy of `v` that can be modified without modifying the FrozenDict containing `v`"""
+
+    if type(v) in _IMMUTABLE_TYPES:
+        return v
+
+    if isinstance(v, FrozenDict):
+        return v._as_dict()
+
+    try:
+        hash(v)
+        return v
+    except TypeError:
+        pass
+
+    # e.g., a tuple (converted from a list) containing a dict
+    if isinstance(v, tuple):
+        return tuple(_unfrozen_value(x) for x in v)
+    return copy.deepcopy(v)
+
+
+_IMMUTABLE_TYPES = {str, int, float, bool, type(None)}
+
+
 def _freeze_dicts(d):
-    for k in list(d.keys()):
-        if isinstance(d[k], dict):
-            d[k] = FrozenDict(d[k])
-        elif isinstance(d[k], list):
-            d[k] = tuple(d[k])
+    for k, v in d.items():
+        if isinstance(v, dict):
+            d[k] = FrozenDict(v)
+        elif isinstance(v, list):
+            d[k] = tuple(v)
+
+
+class _InternKey:
+    """Key for the intern table that refers to the contents of a FrozenDict without keeping the FrozenDict alive"""
+
+    __slots__ = ("d", "hash")
+
+    def __init__(self, d):
+        self.d = d
+        self.hash = hash(frozenset(d.items()))
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        if self.hash != other.hash or len(self.d) != len(other.d):
+            return False
+
+        # keys must also be in the same order, so that an interned FrozenDict iterates in the order its contents were given
+        for (k, v), (other_k, other_v) in zip(self.d.items(), other.d.items()):
+            if k != other_k or (v is not other_v and not _typed_equal(v, other_v)):
+                return False
+
+        return True
+
+
+def _typed_equal(a, b):
+    if a is b:
+        return True
+
+    if type(a) is not type(b):
+        return False
+
+    if type(a) is tuple:
+        return len(a) == len(b) and all(_typed_equal(x, y) for x, y in zip(a, b))
+
+    # nested FrozenDicts are interned, so equal FrozenDicts with the same value types are the same object
+    if type(a) is FrozenDict:
+        return False
+
+    return a == b
+
+
+_interned = weakref.WeakValueDictionary()
+
+
+def _equals_dict(d, other):
+    """Compare the contents of a FrozenDict with a dict as if the dict had been frozen, without freezing it"""
+
+    if len(d) != len(other):
+        return False
+
+    for k, v in d.items():
+        if k not in other:
+            return False
+
+        other_v = other[k]
+        if isinstance(other_v, list):
+            other_v = tuple(other_v)
+
+        if v != other_v:
+            return False
+
+    return True
@@ -0,0 +1,77 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class FileLock:
+    """Exclusive lock held on a file using flock.
+    The lock is released by the operating system if the process holding it dies, so locks never become stale.
+    Note that locks on network filesystems are only reliable if the filesystem supports flock (use a DB lease otherwise).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a")
+        try:
+            fcntl.flock(self._f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info("waiting for lock %s", self.path)
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+
+        return self
+
+    def __exit__(self, *args):
+        import fcntl
+
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+        self._f = None
+
+    def __repr__(self):
+        return f"<FileLock {self.path}>"
+
+
+_local = threading.local()
+_db_managers = {}
+
+
+@contextmanager
+def build_lock(key, method, lock_dir):
+    """Hold an exclusive lock on `key` while building a module, so that only one process builds it at a time (see `ModuleBase`).
+    `method` is "file" to use a `FileLock` in `lock_dir`, which coordinates processes on one host (or sharing a filesystem),
+    or a database URL to use a `DBManager.build_lease`, which coordinates processes on any host.
+    Locks are reentrant within a thread, so building a module with the same key while holding its lock does not deadlock.
+    """
+
+    held = _local.__dict__.setdefault("held", set())
+    if key in held:
+        yield
+        return
+
+    if method == "file":
+        lock = FileLock(lock_dir / f"{key}.lock")
+    else:
+        from profane.sql import DBManager
+
+        # connections cannot be shared with forked processes, so each process uses its own DBManager
+        db_key = (os.getpid(), method)
+        if db_key not in _db_managers:
+            _db_managers[db_key] = DBManager(method)
+        lock = _db_managers[db_key].build_lease(key)
+
+    held.add(key)
+    try:
+        with lock:
+            yield
+    finally:
+        held.discard(key)
@@ -0,0 +1,155 @@
+import ast
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+MANIFEST_FILENAME = "profane_manifest.json"
+
+
+def scan_package(package_dir, package=None):
+    """Find the modules registered in the .py files under `package_dir` without importing them.
+    Classes decorated with `@<Class>.register` are found by parsing each file. Their `module_type` may be declared by
+    a parent class in any file of the package. `package` is the dotted name that `package_dir` is imported as
+    (by default, the name of the directory).
+
+    Returns a dict mapping (module_type, module_name) pairs to the name of the Python module that registers them.
+    """
+
+    package_dir = os.path.abspath(package_dir)
+    if package is None:
+        package = os.path.basename(package_dir)
+
+    classes = {}
+    registered = []
+    for dirpath, dirnames, filenames in os.walk(package_dir):
+        dirnames[:] = sorted(dn for dn in dirnames if not dn.startswith((".", "__")))
+        for fn in sorted(filenames):
+            if not fn.endswith(".py") or fn.startswith(("flycheck_", "#")):
+                continue
+
+            path = os.path.join(dirpath, fn)
+            relative = os.path.relpath(path, package_dir)[: -len(".py")].split(os.sep)
+            if relative[-1] == "__init__":
+                relative = relative[:-1]
+            import_path = ".".join([package] + relative)
+
+            with open(path, "rt", encoding="utf-8") as f:
+                try:
+                    tree = ast.parse(f.read(), filename=path)
+                except SyntaxError:
+                    logger.warning("skipping %s, which could not be parsed", path)
+                    continue
+
+            for node in ast.walk(tree):
+                if isinstance(node, ast.ClassDef):
+                    attrs = _class_attributes(node)
+                    classes.setdefault(node.name, (attrs.get("module_type"), [_name(base) for base in node.bases]))
+                    if any(_name(decorator) == "register" for decorator in node.decorator_list):
+                        registered.append((node, attrs, import_path))
+
+    modules = {}
+    for node, attrs, import_path in registered:
+        module_type = attrs.get("module_type") or _inherited_module_type(node.name, classes)
+        module_name = attrs.get("module_name")
+        if module_type is None or module_name is None:
+            logger.warning(
+                "skipping %s in %s, because its module_type or module_name is not a string literal", node.name, import_path
+            )
+            continue
+
+        modules[(module_type, module_name)] = import_path
+
+    return modules
+
+
+def write_manifest(package_dir, filename=None, package=None):
+    """Scan `package_dir` (see `scan_package`) and write a manifest to `filename`, which is inside `package_dir` by default.
+    Returns the manifest's filename."""
+
+    modules = scan_package(package_dir, package=package)
+    if filename is None:
+        filename = os.path.join(package_dir, MANIFEST_FILENAME)
+
+    entries = [
+        {"module_type": module_type, "module_name": module_name, "import_path": import_path}
+        for (module_type, module_name), import_path in sorted(modules.items())
+    ]
+    with open(filename, "wt") as outf:
+        json.dump({"modules": entries}, outf, indent=2)
+
+    return filename
+
+
+def load_manifest(filename):
+    """Return a dict mapping (module_type, module_name) pairs to the Python modules that register them"""
+
+    with open(filename, "rt") as f:
+        manifest = json.load(f)
+
+    return {(entry["module_type"], entry["module_name"]): entry["import_path"] for entry in manifest["modules"]}
+
+
+def _class_attributes(node):
+    attrs = {}
+    for statement in node.body:
+        if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Constant):
+            for target in statement.targets:
+                if isinstance(target, ast.Name) and isinstance(statement.value.value, str):
+                    attrs[target.id] = statement.value.value
+
+    return attrs
+
+
+def _inherited_module_type(class_name, classes, seen=None):
+    seen = set() if seen is None else seen
+    if class_name in seen or class_name not in classes:
+        return None
+    seen.add(class_name)
+
+    module_type, bases = classes[class_name]
+    if module_type is not None:
+        return module_type
+
+    for base in bases:
+        module_type = _inherited_module_type(base, classes, seen)
+        if module_type is not None:
+            return module_type
+
+    return None
+
+
+def _name(node):
+    """Return the name referred to by a Name or Attribute node (e.g., 'register' for 'Task.register')"""
+
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def main(argv=None):
+    from docopt import docopt
+
+    help = """
+            Usage:
+              profane manifest PACKAGE_DIR [--package=NAME] [--output=FILE]
+              profane manifest (-h | --help)
+
+
+            Options:
+              -h --help               Print this help message and exit.
+              -p NAME --package=NAME  Dotted name that PACKAGE_DIR is imported as. Defaults to the directory's name.
+              -o FILE --output=FILE   Where to write the manifest. Defaults to PACKAGE_DIR/profane_manifest.json.
+
+
+            Arguments:
+              PACKAGE_DIR  Directory containing the modules to scan for @<Class>.register declarations
+           """
+
+    arguments = docopt(help, argv=argv)
+    filename = write_manifest(arguments["PACKAGE_DIR"], filename=arguments["--output"], package=arguments["--package"])
+    print(f"wrote {len(load_manifest(filename))} modules to {filename}")
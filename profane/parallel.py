@@ -0,0 +1,199 @@
+import contextvars
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_local = threading.local()
+
+
+def run_coroutine(coro):
+    """Run `coro` to completion from synchronous code and return its result.
+    If an event loop is already running in this thread (e.g., when a module is created synchronously inside a coroutine),
+    the coroutine is run on a new event loop in another thread, because the running loop cannot be re-entered."""
+
+    # asyncio is slow to import, so it is only imported when a module has an async build
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="profane-async") as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coro).result()
+
+
+def current_plan():
+    """Return the `BuildPlan` collecting builds in this thread, if any"""
+    return getattr(_local, "plan", None)
+
+
+class _InFlight:
+    """A module whose build has been deferred by a `BuildPlan` and has not finished yet"""
+
+    __slots__ = ("module", "event", "error")
+
+    def __init__(self, module):
+        self.module = module
+        self.event = threading.Event()
+        self.error = None
+
+    def finish(self, error=None):
+        self.error = error
+        _in_flight.pop(id(self.module), None)
+        self.event.set()
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise RuntimeError(f"{self.module!r} failed to build") from self.error
+
+
+# modules whose builds were deferred by any BuildPlan, keyed by their ids
+_in_flight = {}
+
+
+def wait_for_build(module):
+    """Wait until `module` is built if its build was deferred by a `BuildPlan` (e.g., in another thread or asyncio task).
+    If a plan is active in this thread, the plan waits for the build before building the modules that depend on `module`.
+    """
+
+    entry = _in_flight.get(id(module))
+    if entry is None or entry.module is not module:
+        return
+
+    plan = current_plan()
+    if plan is None:
+        entry.wait()
+    elif id(module) not in plan.pending:
+        plan.external[id(module)] = entry
+
+
+class BuildPlan:
+    """Collects the `build` calls of modules while a module graph is constructed, so that they can be run concurrently.
+
+    Modules are still constructed one after another, so that `provide`, `provide_this`, and `provide_children` behave as usual.
+    Afterward, `run` builds each module once all of its dependencies (including provided dependencies) have been built,
+    so modules that do not depend on each other (e.g., two searchers) are built at the same time.
+    Builds run in threads rather than processes, because `build` sets up state on the module object itself.
+    Alternatively, `arun` awaits the builds on the running event loop, so that `async def build()` methods overlap their waits.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        # modules being built by other plans that modules in this plan depend on
+        self.external = {}
+
+    def __enter__(self):
+        if current_plan() is not None:
+            raise RuntimeError("a BuildPlan is already active in this thread")
+
+        _local.plan = self
+        return self
+
+    def __exit__(self, *args):
+        _local.plan = None
+
+    def add(self, module, span=None):
+        """Defer building `module`. `span` is the module's tracing span, if any, which its build span will be added to."""
+        self.pending[id(module)] = (module, span)
+        _in_flight[id(module)] = _InFlight(module)
+
+    def discard(self, module):
+        """Do not build `module` (e.g., because an equivalent shared object was used in its place)"""
+        if self.pending.pop(id(module), None) is not None:
+            self._finish(id(module))
+
+    def abort(self, error):
+        """Stop waiting for the modules that have not been built, because `error` prevented them from being built"""
+        for key in self.pending:
+            self._finish(key, error)
+
+    def _finish(self, key, error=None):
+        entry = _in_flight.get(key)
+        if entry is not None:
+            entry.finish(error)
+
+    def _dependencies(self, module, pending):
+        return {id(obj) for obj in module._dependency_objects.values() if id(obj) in pending or id(obj) in self.external}
+
+    @property
+    def unbuilt(self):
+        """Modules whose builds are pending, or whose builds were skipped or failed after `run` raised an exception"""
+        return [module for module, _ in self.pending.values()]
+
+    def run(self, workers):
+        """Build the pending modules using up to `workers` threads. The first exception raised by a build is reraised
+        once the builds that already started have finished, and builds that have not started yet are skipped.
+        Modules that were not built successfully are then listed in `unbuilt`."""
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        pending = dict(self.pending)
+        waiting_on = {}
+        dependents = {key: [] for key in list(pending) + list(self.external)}
+        for key, (module, _) in pending.items():
+            dependencies = self._dependencies(module, pending)
+            waiting_on[key] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(key)
+
+        error = None
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="profane-build") as executor:
+
+            def submit(key):
+                module, span = pending[key]
+                # builds see the same context (e.g., constants scopes) as the code that constructed the modules
+                return executor.submit(contextvars.copy_context().run, module._run_build, span)
+
+            running = {executor.submit(entry.wait): key for key, entry in self.external.items()}
+            running.update({submit(key): key for key, count in waiting_on.items() if count == 0})
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+
+                    if key in pending:
+                        del self.pending[key]
+                        self._finish(key)
+                    for dependent in dependents[key]:
+                        waiting_on[dependent] -= 1
+                        if waiting_on[dependent] == 0 and error is None:
+                            running[submit(dependent)] = dependent
+
+        if error is not None:
+            raise error
+
+    async def arun(self):
+        """Build the pending modules concurrently on the running event loop. Async builds are awaited on the loop,
+        while synchronous builds (and builds that hold a build lock) run in the loop's default executor.
+        Like `run`, the first exception raised by a build is reraised and modules that were not built remain in `unbuilt`."""
+
+        import asyncio
+
+        pending = dict(self.pending)
+        loop = asyncio.get_running_loop()
+        # waiting for modules built by other plans would block the event loop, so it happens in the loop's executor
+        tasks = {key: loop.run_in_executor(None, entry.wait) for key, entry in self.external.items()}
+
+        async def build(key):
+            module, span = pending[key]
+            await asyncio.gather(*(tasks[dependency] for dependency in self._dependencies(module, pending)))
+            await module._arun_build(span)
+            del self.pending[key]
+            self._finish(key)
+
+        # every task is created before any of them run, so each task can find the tasks of its dependencies
+        for key in pending:
+            tasks[key] = asyncio.ensure_future(build(key))
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,142 @@
+import collections
+import contextlib
+import logging
+import traceback
+
+from profane.base import _parallel_builds
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class RunPlan:
+    """Plan for executing a batch of runs (e.g., the runs queued by a sweep) that builds modules shared by several runs once.
+
+    Each run is resolved to its module graph without building anything (see `ModuleBase.resolve`), and the distinct modules
+    used by the runs are identified by their `config_digest`. `build` then creates each distinct module once (in dependency order,
+    building independent modules in parallel) before `execute` dispatches the runs. Because created modules are shared
+    (see `ModuleBase.create`), each run reuses the modules that were already built rather than building its own.
+
+    If `db` (a `DBManager`) is given, heartbeats are recorded for all of the claimed runs from the time the plan is created
+    until `execute` finishes (or `close` is called), so that workers running `clear_stale_runs` do not mark runs as FAILED
+    while they wait for the batch's modules to be built or for earlier runs to finish.
+
+    Args:
+        runs: `Run` objects (e.g., from `DBManager.claim_runs`) or (command, config) pairs
+        lookup: a function that takes a run's command and returns the class of the module that executes it (e.g., a task)
+        db: the `DBManager` the runs were claimed from, if any
+        heartbeat_interval: seconds between heartbeats recorded for the runs (see `DBManager.heartbeat`)
+    """
+
+    def __init__(self, runs, lookup, db=None, heartbeat_interval=30):
+        self.runs = []
+        self.modules = {}
+        self.references = collections.Counter()
+        self.db = db
+        self.heartbeat_interval = heartbeat_interval
+        self._heartbeats = contextlib.ExitStack()
+
+        runs = list(runs)
+        claimed = [run for run in runs if hasattr(run, "run_id")]
+        if db is not None and claimed:
+            self._heartbeats.enter_context(db.heartbeat(claimed, heartbeat_interval))
+
+        try:
+            self._plan(runs, lookup)
+        except BaseException:
+            self.close()
+            raise
+
+    def _plan(self, runs, lookup):
+        for run in runs:
+            command, config = (run.command, run.config) if hasattr(run, "command") else run
+            resolved = lookup(command).resolve(config)
+            self.runs.append((run, command, config, resolved))
+
+            # modules are added after their dependencies, so building them in order builds dependencies first
+            seen = set()
+            for dependency in _walk_dependencies(resolved):
+                digest = dependency.config_digest()
+                if digest not in seen:
+                    seen.add(digest)
+                    self.references[digest] += 1
+                    self.modules.setdefault(digest, dependency)
+
+    def shared_modules(self):
+        """Return the distinct modules that are used by more than one run"""
+        return [module for digest, module in self.modules.items() if self.references[digest] > 1]
+
+    def build(self, workers=1):
+        """Create and build each distinct module once, using up to `workers` threads to build modules that do not depend on each other.
+        Modules are created with `ModuleBase.create`, so they are shared with the runs executed afterward."""
+
+        logger.info(
+            "building %s distinct modules used %s times by %s runs",
+            len(self.modules),
+            sum(self.references.values()),
+            len(self.runs),
+        )
+
+        try:
+            with _parallel_builds(True, workers):
+                for module in self.modules.values():
+                    module.module_cls.create(module.module_name, module.config)
+        except BaseException:
+            self.close()
+            raise
+
+    def execute(self, run_function, db=None):
+        """Call `run_function(command, config)` for each run after the shared modules have been built (see `build`).
+
+        If `db` (a `DBManager`, by default the plan's `db`) is given, the runs are marked as completed or failed in the database,
+        and failed runs do not prevent the remaining runs from being executed. Otherwise, exceptions are raised.
+        Returns the runs that failed. Heartbeats for the runs stop once all of them have been executed.
+        """
+
+        db = db if db is not None else self.db
+        failed = []
+        try:
+            for run, command, config, _ in self.runs:
+                if db is None:
+                    run_function(command, config)
+                    continue
+
+                db.running_event(run)
+                try:
+                    with db.heartbeat(run, self.heartbeat_interval):
+                        run_function(command, config)
+                except Exception:
+                    logger.error("run %s failed:\n%s", run.run_id, traceback.format_exc())
+                    db.failed_event(run)
+                    failed.append(run)
+                else:
+                    db.completed_event(run)
+        finally:
+            self.close()
+
+        return failed
+
+    def close(self):
+        """Stop recording heartbeats for the plan's runs"""
+        self._heartbeats.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"<RunPlan runs={len(self.runs)} modules={len(self.modules)} shared={len(self.shared_modules())}>"
+
+
+def _walk_dependencies(resolved):
+    """Yield the modules in a resolved module graph (excluding the root) with each module's dependencies before the module"""
+
+    for key, dependency in resolved._dependency_objects.items():
+        # provided modules belong to the module that provides them (or were passed in from outside the run)
+        if key in resolved._provided_dependency:
+            continue
+
+        yield from _walk_dependencies(dependency)
+        yield dependency
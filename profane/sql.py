@@ -1,13 +1,21 @@
 import datetime
+import itertools
+import logging
 import os
+import random
 import socket
+import threading
+import time
+import uuid
 
 from contextlib import contextmanager
 
 import sqlalchemy as sa
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils import database_exists, create_database
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
 Base = declarative_base()
 
@@ -30,19 +38,138 @@ class Run(Base):
     stop_time = sa.Column(sa.DateTime(timezone=True))
     queue_time = sa.Column(sa.DateTime(timezone=True))
 
-    idx1 = sa.Index("idx_status_priority_tries", status, priority, tries)
+    # updated periodically by processes executing the run (see DBManager.heartbeat)
+    heartbeat_time = sa.Column(sa.DateTime(timezone=True))
+
+    # random tie-breaker among runs with the same priority, so that claiming does not need to sort by random()
+    claim_key = sa.Column(sa.Float, default=random.random)
+
+    # runs that may be claimed. this is a literal (rather than parameterized) clause so that the query planner can
+    # match it against the partial index below, which is sorted in the same order as eligible runs are claimed
+    is_eligible = sa.text("status IN ('QUEUED', 'FAILED')")
+    claim_order = (priority.desc(), claim_key.desc())
+    is_running = sa.text("status = 'RUNNING'")
+
+    # hostname is the leading column so that query planners do not prefer this index over idx2 when claiming runs
+    idx1 = sa.Index("idx_hostname_status", hostname, status)
+    idx2 = sa.Index(
+        "idx_eligible_priority_claim_key", priority, claim_key, postgresql_where=is_eligible, sqlite_where=is_eligible
+    )
+    idx3 = sa.Index("idx_running_heartbeat_time", heartbeat_time, postgresql_where=is_running, sqlite_where=is_running)
+
+
+class BuildLease(Base):
+    """A lease held by the process that is building a module (see `DBManager.build_lease`)"""
+
+    __tablename__ = "build_lease"
+
+    key = sa.Column(sa.String, primary_key=True)
+    holder = sa.Column(sa.String)
+    hostname = sa.Column(sa.String)
+    pid = sa.Column(sa.Integer)
+    acquire_time = sa.Column(sa.DateTime(timezone=True))
+    heartbeat_time = sa.Column(sa.DateTime(timezone=True))
+
+
+def _claim_runs_statement():
+    """Return an UPDATE statement that claims eligible runs (see `DBManager.claim_runs`)"""
+
+    eligible_run_ids = (
+        sa.select(Run.run_id)
+        .where(Run.is_eligible)
+        .where(Run.tries < sa.bindparam("max_tries"))
+        .order_by(*Run.claim_order)
+        .limit(sa.bindparam("n"))
+        .with_for_update(skip_locked=True)
+    )
+
+    return (
+        sa.update(Run)
+        .where(Run.run_id.in_(eligible_run_ids))
+        .values(
+            status="RUNNING",
+            start_time=sa.bindparam("start_time"),
+            heartbeat_time=sa.bindparam("start_time"),
+            hostname=sa.bindparam("hostname"),
+            pid=sa.bindparam("pid"),
+            tries=Run.tries + 1,
+        )
+        .returning(*Run.__table__.columns)
+    )
 
 
 class DBManager:
-    def __init__(self, url):
-        engine = sa.create_engine(url, pool_pre_ping=True)
-        if not database_exists(engine.url):
-            print("creating missing DB")
-            create_database(engine.url)
+    """Manages a queue of runs stored in a database.
+
+    Postgres is recommended when workers on several hosts share a queue. SQLite URLs (e.g., 'sqlite:////path/runs.db')
+    are also supported for single-node deployments and tests. In this case the database file is opened in WAL mode and
+    each transaction begins with BEGIN IMMEDIATE, so that claiming runs is serialized by SQLite's write lock
+    rather than by row locks.
+    """
+
+    # the claim statement is constructed once, since building it takes longer than executing it
+    _claim_statement = _claim_runs_statement()
+
+    def __init__(self, url, sqlite_timeout=60):
+        url = sa.engine.make_url(url)
+        if url.get_backend_name() == "sqlite":
+            engine = self._create_sqlite_engine(url, sqlite_timeout)
+        else:
+            from sqlalchemy_utils import database_exists, create_database
+
+            engine = sa.create_engine(url, pool_pre_ping=True)
+            if not database_exists(engine.url):
+                print("creating missing DB")
+                create_database(engine.url)
 
         Base.metadata.create_all(engine)
+        self._upgrade_schema(engine)
+
+        self.engine = engine
+        # objects are not expired on commit, so that Run objects remain usable after their session is closed (eg in worker.py)
+        self.sessionmaker = sessionmaker(bind=engine, expire_on_commit=False)
 
-        self.sessionmaker = sessionmaker(bind=engine)
+    @staticmethod
+    def _create_sqlite_engine(url, timeout):
+        engine = sa.create_engine(url, connect_args={"timeout": timeout})
+
+        @sa.event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            # disable pysqlite's transaction handling so that we can emit BEGIN ourselves
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        @sa.event.listens_for(engine, "begin")
+        def on_begin(conn):
+            # take the write lock immediately, since most transactions modify runs after reading them
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+        return engine
+
+    def _upgrade_schema(self, engine):
+        """Add any columns and indexes that are missing from a run table created by an older version of profane"""
+
+        existing_columns = {column["name"] for column in sa.inspect(engine).get_columns(Run.__tablename__)}
+        with engine.begin() as conn:
+            for column in Run.__table__.columns:
+                if column.name not in existing_columns:
+                    print(f"adding missing column to {Run.__tablename__} table: {column.name}")
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(sa.text(f"ALTER TABLE {Run.__tablename__} ADD COLUMN {column.name} {column_type}"))
+
+            if "claim_key" not in existing_columns:
+                # backfill with a multiplicative hash of the run_id, which can be computed portably in SQL
+                conn.execute(sa.update(Run.__table__).values(claim_key=(Run.run_id * 2654435761 % 4294967296) / 4294967296.0))
+
+        with engine.begin() as conn:
+            # replaced by idx_eligible_priority_claim_key
+            conn.execute(sa.text("DROP INDEX IF EXISTS idx_status_priority_tries"))
+
+        for index in Run.__table__.indexes:
+            index.create(engine, checkfirst=True)
 
     def queue_run(self, command, config, priority=0):
         run = Run(
@@ -58,37 +185,237 @@ class DBManager:
 
         return run.run_id
 
+    def queue_runs(self, runs, chunk_size=1000):
+        """Queue many runs at once. `runs` is an iterable of (command, config, priority) tuples.
+        Runs are inserted in chunks of `chunk_size` rows using multi-row INSERT statements inside a single transaction.
+        Returns a list of the run_ids assigned, in the same order as `runs`.
+        """
+
+        queue_time = datetime.datetime.now(datetime.timezone.utc)
+        insert = sa.insert(Run.__table__).returning(Run.__table__.c.run_id)
+
+        run_ids = []
+        runs = iter(runs)
+        start = time.time()
+        with self.engine.begin() as conn:
+            while True:
+                rows = [
+                    {"command": command, "config": config, "priority": priority, "status": "QUEUED", "queue_time": queue_time}
+                    for command, config, priority in itertools.islice(runs, chunk_size)
+                ]
+                if not rows:
+                    break
+
+                # run_ids are assigned in insertion order, but RETURNING does not guarantee the order of the returned rows
+                run_ids.extend(sorted(row[0] for row in conn.execute(insert.values(rows))))
+
+        elapsed = time.time() - start
+        logger.info("queued %s runs in %.2fs (%.0f rows/s)", len(run_ids), elapsed, len(run_ids) / max(elapsed, 1e-9))
+        return run_ids
+
     def clear_zombie_runs(self):
-        # TODO first find runs, then do for_update later when clearing them only
-        with self.session_scope() as session:
-            for run in (
-                session.query(Run)
-                .filter(sa.and_(Run.status == "RUNNING", Run.hostname == socket.gethostname()))
-                .with_for_update()
-            ):
-                if not os.path.exists(f"/proc/{run.pid}"):
-                    print(f"found zombie run_id={run.run_id} with pid: {run.pid}")
-                    run.status = "FAILED"
-                    session.add(run)
+        """Mark RUNNING runs on this host as FAILED if the process executing them no longer exists.
+        See `clear_stale_runs` for a check that works across hosts."""
+
+        # find candidates without holding locks, and then only update runs that have not been claimed again since
+        with self.engine.connect() as conn:
+            candidates = conn.execute(
+                sa.select(Run.run_id, Run.pid).where(Run.hostname == socket.gethostname()).where(Run.status == "RUNNING")
+            ).all()
+
+        zombies = [(run_id, pid) for run_id, pid in candidates if not os.path.exists(f"/proc/{pid}")]
+        if not zombies:
+            return
+
+        with self.engine.begin() as conn:
+            for run_id, pid in zombies:
+                print(f"found zombie run_id={run_id} with pid: {pid}")
+                conn.execute(
+                    sa.update(Run)
+                    .where(Run.run_id == run_id)
+                    .where(Run.status == "RUNNING")
+                    .where(Run.pid == pid)
+                    .values(status="FAILED", stop_time=datetime.datetime.now(datetime.timezone.utc))
+                )
+
+    def clear_stale_runs(self, lease=300):
+        """Mark RUNNING runs as FAILED if their heartbeat is more than `lease` seconds old, regardless of their host.
+        Runs that have never recorded a heartbeat are ignored. Returns the run_ids of the runs that were cleared.
+        """
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        clear = (
+            sa.update(Run)
+            .where(Run.is_running)
+            .where(Run.heartbeat_time < now - datetime.timedelta(seconds=lease))
+            .values(status="FAILED", stop_time=now)
+            .returning(Run.run_id)
+        )
+
+        with self.engine.begin() as conn:
+            run_ids = [row[0] for row in conn.execute(clear)]
+
+        for run_id in run_ids:
+            print(f"found stale run_id={run_id} with no heartbeat in the last {lease}s")
+
+        return run_ids
+
+    @contextmanager
+    def heartbeat(self, run, interval=30):
+        """Record a heartbeat for `run` every `interval` seconds from a background thread while the context is active.
+        `run` can also be a list of runs (e.g., a batch claimed with `claim_runs`), whose heartbeats are recorded together.
+        The lease given to `clear_stale_runs` should be several times larger than `interval`."""
+
+        runs = list(run) if isinstance(run, (list, tuple)) else [run]
+        run_ids = [each.run_id for each in runs]
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self._record_heartbeat(runs)
+                except sa.exc.SQLAlchemyError:
+                    logger.exception("failed to record heartbeat for run_ids=%s", run_ids)
+
+        self._record_heartbeat(runs)
+        name = f"heartbeat-{run_ids[0]}" if len(run_ids) == 1 else f"heartbeat-{len(run_ids)}-runs"
+        thread = threading.Thread(target=beat, name=name, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _record_heartbeat(self, runs):
+        with self.engine.begin() as conn:
+            conn.execute(
+                sa.update(Run)
+                .where(Run.run_id.in_([each.run_id for each in runs]))
+                .where(Run.status == "RUNNING")
+                .values(heartbeat_time=datetime.datetime.now(datetime.timezone.utc))
+            )
+
+    @contextmanager
+    def build_lease(self, key, heartbeat_interval=30, lease=300, poll_interval=1):
+        """Hold an exclusive lease on `key` while the context is active, waiting until it is available.
+        While the lease is held, a heartbeat is recorded every `heartbeat_interval` seconds. If the holder of a lease has not
+        recorded a heartbeat in `lease` seconds, it is presumed dead and its lease is taken over.
+        """
+
+        holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        waiting_since = None
+        while not self._acquire_build_lease(key, holder, lease):
+            if waiting_since is None:
+                waiting_since = time.time()
+                logger.info("waiting for build lease on %s", key)
+            time.sleep(poll_interval)
+
+        if waiting_since is not None:
+            logger.info("acquired build lease on %s after %.1fs", key, time.time() - waiting_since)
+
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(heartbeat_interval):
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(
+                            sa.update(BuildLease)
+                            .where(BuildLease.key == key)
+                            .where(BuildLease.holder == holder)
+                            .values(heartbeat_time=datetime.datetime.now(datetime.timezone.utc))
+                        )
+                except sa.exc.SQLAlchemyError:
+                    logger.exception("failed to record heartbeat for build lease on %s", key)
+
+        thread = threading.Thread(target=beat, name=f"build-lease-{key}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            with self.engine.begin() as conn:
+                conn.execute(sa.delete(BuildLease).where(BuildLease.key == key).where(BuildLease.holder == holder))
+
+    def _acquire_build_lease(self, key, holder, lease):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            with self.engine.begin() as conn:
+                stale = conn.execute(
+                    sa.delete(BuildLease)
+                    .where(BuildLease.key == key)
+                    .where(BuildLease.heartbeat_time < now - datetime.timedelta(seconds=lease))
+                    .returning(BuildLease.holder)
+                ).all()
+                for (stale_holder,) in stale:
+                    logger.warning("taking over stale build lease on %s from %s", key, stale_holder)
+
+                conn.execute(
+                    sa.insert(BuildLease).values(
+                        key=key,
+                        holder=holder,
+                        hostname=socket.gethostname(),
+                        pid=os.getpid(),
+                        acquire_time=now,
+                        heartbeat_time=now,
+                    )
+                )
+        except sa.exc.IntegrityError:
+            return False
+
+        return True
 
     def get_eligible_run(self, max_tries=3):
         with self.session_scope() as session:
             run = (
                 session.query(Run)
-                .filter(sa.or_(Run.status == "QUEUED", Run.status == "FAILED"))
+                .filter(Run.is_eligible)
                 .filter(Run.tries < max_tries)
-                .order_by(Run.priority.desc(), sa.text("random()"))
+                .order_by(*Run.claim_order)
                 .limit(1)
-                .with_for_update()
+                .with_for_update(skip_locked=True)
                 .first()
             )
 
         return run
 
+    def claim_runs(self, n=1, max_tries=3):
+        """Atomically claim up to `n` eligible runs for this process and mark them as RUNNING.
+        Runs with a higher priority are claimed first; runs with the same priority are claimed in a random order.
+
+        Rows locked by concurrent workers are skipped rather than waited on, so workers never block each other.
+        (With SQLite, claims are instead serialized by the database's write lock, which is held only briefly.)
+        Returns a list of the claimed runs, which may be empty if no runs are eligible.
+        """
+
+        params = {
+            "n": n,
+            "max_tries": max_tries,
+            "start_time": datetime.datetime.now(datetime.timezone.utc),
+            "hostname": socket.gethostname(),
+            "pid": os.getpid(),
+        }
+
+        # use a Core connection rather than a session to keep the transaction (and SQLite's write lock) short
+        with self.engine.begin() as conn:
+            rows = conn.execute(self._claim_statement, params).all()
+
+        runs = [Run(**row._mapping) for row in rows]
+        return sorted(runs, key=lambda run: (-run.priority, -run.claim_key))
+
+    def claim_run(self, max_tries=3):
+        """Atomically claim a single eligible run (see `claim_runs`). Returns None if no runs are eligible."""
+
+        runs = self.claim_runs(n=1, max_tries=max_tries)
+        return runs[0] if runs else None
+
     def started_event(self, run):
         with self.session_scope() as session:
             run = session.query(Run).filter(Run.run_id == run.run_id).with_for_update().one()
             run.start_time = datetime.datetime.now(datetime.timezone.utc)
+            run.heartbeat_time = run.start_time
             run.hostname = socket.gethostname()
             run.pid = os.getpid()
             run.status = "RUNNING"
@@ -96,6 +423,19 @@ class DBManager:
 
             session.add(run)
 
+    def running_event(self, run):
+        """Record that `run` is being executed by the current process.
+        This is needed when a run is claimed by one process (e.g., with `claim_runs`) and then executed by another.
+        """
+
+        with self.session_scope() as session:
+            run = session.query(Run).filter(Run.run_id == run.run_id).with_for_update().one()
+            run.hostname = socket.gethostname()
+            run.pid = os.getpid()
+            run.heartbeat_time = datetime.datetime.now(datetime.timezone.utc)
+
+            session.add(run)
+
     def _ended_event(self, run, status):
         with self.session_scope() as session:
             run = session.query(Run).filter(Run.run_id == run.run_id).with_for_update().one()
@@ -125,5 +465,6 @@ class DBManager:
         except:
             session.rollback()
             raise
-
-        # unlike the example, we don't call session.close() since this invalidates Run objects (eg in worker.py)
+        finally:
+            # close the session so that it does not hold a connection (or SQLite's write lock) until it is collected
+            session.close()
@@ -0,0 +1,104 @@
+import itertools
+
+from profane.cli import config_list_to_dict, _config_list_to_pairs, _flatten
+from profane.config_option import _parse_string_as_range
+from profane.frozendict import FrozenDict
+
+AXIS_SEPARATOR = "x"
+
+
+def sweep_string_to_axes(s):
+    """Parse a sweep string such as 'searcher.b=0.1..0.9,0.1 x searcher.index.stemmer=porter,krovetz' into axes"""
+
+    return sweep_list_to_axes(s.split())
+
+
+def sweep_list_to_axes(l):
+    """Parse a list of sweep tokens into a list of axes.
+
+    Axes are separated by an 'x' token and are combined using their cartesian product.
+    Each axis contains one or more 'key=values' assignments, where values are either a comma-separated list ('a,b,c')
+    or a range ('start..stop,step'). Multiple assignments within the same axis are varied together (i.e., zipped),
+    so they must contain the same number of values; an assignment with a single value is repeated as needed.
+
+    Each axis is returned as a list of [(key, value), ...] assignments, one per point along the axis.
+    """
+
+    groups = [[]]
+    for token in l:
+        if token == AXIS_SEPARATOR:
+            groups.append([])
+        else:
+            groups[-1].append(token)
+
+    axes = []
+    for group in groups:
+        if not group:
+            raise ValueError(f"empty sweep axis in: {' '.join(l)}")
+
+        assignments = [(k, _expand_sweep_values(v)) for k, v in _config_list_to_pairs(group)]
+        length = max(len(values) for k, values in assignments)
+        for k, values in assignments:
+            if len(values) not in (1, length):
+                raise ValueError(f"sweep axis '{' '.join(group)}' zips '{k}' with {len(values)} values but expected {length}")
+
+        axis = [[(k, values[idx] if len(values) > 1 else values[0]) for k, values in assignments] for idx in range(length)]
+        axes.append(axis)
+
+    return axes
+
+
+def _expand_sweep_values(v):
+    """Expand a value string into a list of strings, treating 'start..stop,step' as a range"""
+
+    if ".." in v:
+        for item_type in (int, float):
+            try:
+                as_range = _parse_string_as_range(v, item_type)
+            except ValueError:
+                continue
+
+            if as_range:
+                return [str(item_type(x)) for x in as_range]
+
+    return v.split(",")
+
+
+def expand_sweep(axes, module_cls=None, config=None, provide=None, deduplicate=True):
+    """Lazily generate the config dicts described by the cartesian product of `axes`.
+
+    Args:
+        axes: a sweep string, a list of sweep tokens, or axes returned by `sweep_list_to_axes`
+        module_cls: if provided, each config is validated with `module_cls.compute_config` (no modules are built)
+        config: a base config dict that each sweep point is applied to
+        provide: passed to `compute_config` along with each config
+        deduplicate: if true, configs that are equivalent to a config generated earlier are skipped.
+                     When `module_cls` is given, this compares the effective configs returned by `compute_config`,
+                     so points that differ only in options that are overridden (e.g., by provided modules) are dropped.
+
+    Configs are generated one at a time, so only the set of configs seen so far is kept in memory (when deduplicating).
+    Yields config dicts in the same format returned by `config_list_to_dict`.
+    """
+
+    if isinstance(axes, str):
+        axes = sweep_string_to_axes(axes)
+    elif axes and isinstance(axes[0], str):
+        axes = sweep_list_to_axes(axes)
+
+    base_config = [] if config is None else _flatten(config)
+
+    seen = set()
+    for point in itertools.product(*axes):
+        point_config = config_list_to_dict(base_config + [f"{k}={v}" for assignments in point for k, v in assignments])
+
+        if module_cls is not None:
+            key = module_cls.compute_config(point_config, provide=provide)
+        else:
+            key = FrozenDict(point_config)
+
+        if deduplicate:
+            if key in seen:
+                continue
+            seen.add(key)
+
+        yield point_config
@@ -0,0 +1,205 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_active_tracer = None
+_no_span = nullcontext()
+# the spans enclosing the current code. this is a context variable so that concurrent asyncio tasks nest their spans separately
+_span_stack = contextvars.ContextVar("profane_span_stack", default=())
+
+
+def active_tracer():
+    """Return the `Tracer` that is currently recording, if any"""
+    return _active_tracer
+
+
+def span(name, category, parent=None, **args):
+    """Return a context manager that records a span in the active `Tracer`, or does nothing if no tracer is active"""
+
+    tracer = _active_tracer
+    if tracer is None:
+        return _no_span
+    return tracer.span(name, category, parent=parent, **args)
+
+
+class Span:
+    __slots__ = ("name", "category", "args", "start", "end", "tid", "children")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+        self.end = None
+        self.tid = threading.get_ident()
+        self.children = []
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / 1e9 if self.end is not None else None
+
+    def child_duration(self, name):
+        return sum(child.duration for child in self.children if child.name == name and child.end is not None)
+
+    def __repr__(self):
+        return f"<Span {self.name} {self.duration}s>"
+
+
+class Tracer:
+    """Records how long module construction takes, and where each module object came from.
+
+    While a tracer is active (``with Tracer() as tracer: ...``), module construction records nested spans:
+    - "create" when a module is created with `ModuleBase.create`. The "shared" arg is "hit" if an existing object with the same
+      config was returned from `module_registry.shared_objects`, "miss" if the new object was shared, or "disabled".
+    - "construct" for each module object, with the module's type, name, and path.
+    - "validate", "dependencies", and "build" for each step of construction. The "dependencies" span's args list which
+      dependencies were provided by the pipeline and which were created.
+
+    Spans can be exported in Chrome's trace event format (viewable in chrome://tracing or https://ui.perfetto.dev)
+    with `write_chrome_trace` or summarized as an annotated module graph with `summary`.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._previous = []
+
+    def __enter__(self):
+        global _active_tracer
+
+        self._previous.append(_active_tracer)
+        _active_tracer = self
+        return self
+
+    def __exit__(self, *args):
+        global _active_tracer
+
+        _active_tracer = self._previous.pop()
+
+    @contextmanager
+    def span(self, name, category, parent=None, **args):
+        """Record a span around the body of the `with` statement. Args can be added to the yielded `Span` before it ends.
+        The span is nested in the enclosing span in the same thread or asyncio task, or in `parent` if given (e.g., for work done
+        in another thread).
+        """
+
+        stack = _span_stack.get()
+        current = Span(name, category, args)
+        if parent is not None:
+            with self._lock:
+                parent.children.append(current)
+        elif stack:
+            stack[-1].children.append(current)
+        else:
+            with self._lock:
+                self.spans.append(current)
+
+        token = _span_stack.set(stack + (current,))
+        current.start = time.perf_counter_ns()
+        try:
+            yield current
+        except BaseException as e:
+            current.args["error"] = repr(e)
+            raise
+        finally:
+            current.end = time.perf_counter_ns()
+            _span_stack.reset(token)
+
+    def iter_spans(self, spans=None):
+        for current in self.spans if spans is None else spans:
+            yield current
+            yield from self.iter_spans(current.children)
+
+    def chrome_trace(self):
+        """Return the recorded spans as a dict in Chrome's trace event format"""
+
+        pid = os.getpid()
+        events = [
+            {
+                "name": f"{current.name} {current.args['module']}" if "module" in current.args else current.name,
+                "cat": current.category,
+                "ph": "X",
+                "ts": (current.start - self._origin) / 1000,
+                "dur": (current.end - current.start) / 1000,
+                "pid": pid,
+                "tid": current.tid,
+                "args": {k: _json_value(v) for k, v in current.args.items()},
+            }
+            for current in self.iter_spans()
+            if current.end is not None
+        ]
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, filename):
+        with open(filename, "wt") as outf:
+            json.dump(self.chrome_trace(), outf)
+
+    def summary(self):
+        """Return the module graphs that were constructed, in the format of `ModuleBase.print_module_graph`, annotated with
+        the time spent constructing each module and where the module object came from"""
+
+        lines = []
+        for current in self.spans:
+            _summarize(current, lines, prefix="", shared=None)
+        return "\n".join(lines)
+
+
+def _summarize(current, lines, prefix, shared):
+    if current.name == "create":
+        # a shared object that was found before constructing anything has no construct span of its own
+        if current.args.get("shared") == "hit" and not any(child.name == "construct" for child in current.children):
+            lines.append(f"{prefix}{current.args['module']}  {_format_seconds(current.duration or 0)}  [shared object: hit]")
+            return
+
+        for child in current.children:
+            _summarize(child, lines, prefix, shared=current.args.get("shared"))
+        return
+
+    if current.name != "construct":
+        for child in current.children:
+            _summarize(child, lines, prefix, shared)
+        return
+
+    steps = ", ".join(
+        f"{step} {_format_seconds(current.child_duration(step))}"
+        for step in ("validate", "dependencies", "build")
+        if any(child.name == step for child in current.children)
+    )
+    source = f"shared object: {shared}" if shared else "created"
+    lines.append(f"{prefix}{current.args['module']}  {_format_seconds(current.duration or 0)} ({steps})  [{source}]")
+
+    childprefix = prefix + "    "
+    for dependencies in (child for child in current.children if child.name == "dependencies"):
+        created = iter(dependencies.children)
+        for key in dependencies.args.get("keys", []):
+            if key in dependencies.args.get("provided", {}):
+                lines.append(f"{childprefix}{dependencies.args['provided'][key]}  [provided by pipeline]")
+            else:
+                child = next(created, None)
+                if child is not None:
+                    _summarize(child, lines, childprefix, shared=None)
+
+
+def _format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    return f"{seconds * 1000:.1f}ms"
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    return str(value)
@@ -0,0 +1,296 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+
+from profane.sql import DBManager
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class Worker:
+    """Long-lived worker that claims queued runs and executes them in a pool of child processes.
+
+    The parent process polls the run queue and hands each claimed run to an idle child. Children execute runs by calling
+    `run_function(command, config)`, which is imported once per child when given as a 'module:function' string.
+    Each child is replaced after completing `max_runs_per_child` runs or once its RSS exceeds `max_rss` bytes,
+    which bounds memory growth from state that accumulates across runs (e.g., objects cached by `ModuleBase.create`).
+
+    Args:
+        db_url: URL of the database containing the run queue (see `DBManager`)
+        run_function: a callable or a 'module:function' string identifying the function that executes a run
+        processes: number of child processes
+        max_runs_per_child: replace a child after it completes this many runs (0 for no limit)
+        max_rss: replace a child after a run if its resident set size exceeds this many bytes (0 for no limit)
+        poll_interval: seconds to wait before checking the queue again when no runs are available
+        max_tries: runs that have been tried this many times are not claimed (see `DBManager.claim_runs`)
+        heartbeat_interval: seconds between heartbeats recorded for each run while it is executing
+        lease: runs on any host whose last heartbeat is older than this many seconds are marked as FAILED
+        exit_when_idle: if true, exit once the queue is empty and all children are idle rather than polling forever
+    """
+
+    def __init__(
+        self,
+        db_url,
+        run_function,
+        processes=1,
+        max_runs_per_child=0,
+        max_rss=0,
+        poll_interval=10,
+        max_tries=3,
+        heartbeat_interval=30,
+        lease=300,
+        exit_when_idle=False,
+    ):
+        if processes < 1:
+            raise ValueError(f"processes must be at least 1: {processes}")
+
+        # children import the function themselves, but a function that cannot be imported should fail before runs are claimed
+        if isinstance(run_function, str):
+            load_function(run_function)
+
+        self.db_url = db_url
+        self.run_function = run_function
+        self.processes = processes
+        self.max_runs_per_child = max_runs_per_child
+        self.max_rss = max_rss
+        self.poll_interval = poll_interval
+        self.max_tries = max_tries
+        self.heartbeat_interval = heartbeat_interval
+        self.lease = lease
+        self.exit_when_idle = exit_when_idle
+
+        self.db = DBManager(db_url)
+
+    def run(self):
+        """Claim and execute runs until interrupted (or until the queue is empty, if `exit_when_idle` is set)"""
+
+        self.db.clear_zombie_runs()
+
+        children = [_Child(self) for _ in range(self.processes)]
+        last_cleared = 0
+        try:
+            while True:
+                if time.time() - last_cleared >= self.heartbeat_interval:
+                    self.db.clear_stale_runs(self.lease)
+                    last_cleared = time.time()
+
+                idle = [child for child in children if child.run is None]
+                runs = self.db.claim_runs(n=len(idle), max_tries=self.max_tries) if idle else []
+                for child, run in zip(idle, runs):
+                    child.assign(run)
+
+                busy = [child for child in children if child.run is not None]
+                if not busy and self.exit_when_idle:
+                    break
+
+                # wait for runs to finish or children to exit; if some children are still idle, poll the queue again sooner
+                timeout = self.heartbeat_interval if len(runs) == len(idle) else min(self.poll_interval, self.heartbeat_interval)
+                ready = wait([child.conn for child in busy] + [child.process.sentinel for child in children], timeout)
+
+                for idx, child in enumerate(children):
+                    if child.conn in ready:
+                        child.receive()
+
+                    if child.conn not in ready and child.process.sentinel not in ready:
+                        continue
+
+                    if not child.process.is_alive() or child.retiring:
+                        child.stop()
+                        children[idx] = _Child(self)
+        finally:
+            for child in children:
+                child.stop()
+
+    def __repr__(self):
+        return f"<Worker processes={self.processes} run_function={self.run_function}>"
+
+
+class _Child:
+    """A child process managed by `Worker` along with the run it is currently executing (if any)"""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.run = None
+        self.retiring = False
+
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_child_main,
+            args=(
+                child_conn,
+                worker.db_url,
+                worker.run_function,
+                worker.max_runs_per_child,
+                worker.max_rss,
+                worker.heartbeat_interval,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        logger.debug("started child pid=%s", self.process.pid)
+
+    def assign(self, run):
+        self.run = run
+        try:
+            self.conn.send(run)
+        except OSError:
+            # the child has exited; the run is marked as failed once the child is stopped
+            logger.error("failed to send run_id=%s to child pid=%s", run.run_id, self.process.pid)
+
+    def receive(self):
+        try:
+            run_id, succeeded, self.retiring = self.conn.recv()
+            logger.info("run_id=%s %s in child pid=%s", run_id, "completed" if succeeded else "failed", self.process.pid)
+            self.run = None
+        except (EOFError, OSError):
+            pass
+
+    def stop(self):
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+
+        self.process.join()
+
+        # collect the outcome of a run that finished while we were waiting
+        try:
+            if self.run is not None and self.conn.poll():
+                self.receive()
+        except OSError:
+            pass
+        self.conn.close()
+
+        # the child exited without reporting the outcome of its current run
+        if self.run is not None:
+            logger.error(
+                "child pid=%s exited with code %s during run_id=%s", self.process.pid, self.process.exitcode, self.run.run_id
+            )
+            self.worker.db.failed_event(self.run)
+            self.run = None
+
+
+def _child_main(conn, db_url, run_function, max_runs, max_rss, heartbeat_interval):
+    db = DBManager(db_url)
+    if isinstance(run_function, str):
+        run_function = load_function(run_function)
+
+    completed = 0
+    try:
+        while True:
+            run = conn.recv()
+            if run is None:
+                break
+
+            db.running_event(run)
+            with db.heartbeat(run, heartbeat_interval):
+                succeeded = _execute_run(db, run, run_function)
+            completed += 1
+
+            retiring = (max_runs and completed >= max_runs) or (max_rss and current_rss() > max_rss)
+            conn.send((run.run_id, succeeded, bool(retiring)))
+            if retiring:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+
+def _execute_run(db, run, run_function):
+    try:
+        run_function(run.command, run.config)
+    except KeyboardInterrupt:
+        db.interrupted_event(run)
+        raise
+    except Exception:
+        logger.exception("failed run_id=%s", run.run_id)
+        db.failed_event(run)
+        return False
+
+    db.completed_event(run)
+    return True
+
+
+def load_function(s):
+    """Import and return the function identified by a 'module:function' string"""
+
+    if s.count(":") != 1:
+        raise ValueError(f"expected a function of the form 'module:function' but got: {s}")
+
+    module_name, function_name = s.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def current_rss():
+    """Return the resident set size of the current process in bytes"""
+
+    try:
+        with open("/proc/self/statm", "rt") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # fall back to the peak RSS, which is reported in kilobytes on Linux and bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def main(argv=None):
+    from docopt import docopt
+
+    help = """
+            Usage:
+              profane worker DB_URL FUNCTION [options]
+              profane (-h | --help)
+
+
+            Options:
+              -h --help                           Print this help message and exit.
+              -n N --processes=N                  Number of child processes that execute runs. [default: 1]
+              -k N --max-runs-per-child=N         Replace each child after it completes N runs (0 for no limit). [default: 0]
+              -m MB --max-rss=MB                  Replace a child once its RSS exceeds MB megabytes (0 for no limit). [default: 0]
+              -i SECONDS --poll-interval=SECONDS  Seconds between checks for new runs when the queue is empty. [default: 10]
+              -t N --max-tries=N                  Do not claim runs that have already been tried N times. [default: 3]
+              -b SECONDS --heartbeat=SECONDS      Seconds between heartbeats recorded for each executing run. [default: 30]
+              -L SECONDS --lease=SECONDS          Fail runs on any host with no heartbeat for this many seconds. [default: 300]
+              -e --exit-when-idle                 Exit once the queue is empty rather than waiting for new runs.
+              -l VALUE --loglevel=VALUE           Set the log level: DEBUG, INFO, WARNING, ERROR, or CRITICAL. [default: INFO]
+
+
+            Arguments:
+              DB_URL    URL of the database containing the run queue
+              FUNCTION  Function that executes a run, given as module:function. It is called as FUNCTION(command, config).
+           """
+
+    arguments = docopt(help, argv=argv)
+    logging.basicConfig(level=arguments["--loglevel"].upper(), format="%(asctime)s %(process)d %(levelname)s %(message)s")
+
+    # like 'python -m', allow FUNCTION to be imported from the current directory
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    worker = Worker(
+        arguments["DB_URL"],
+        arguments["FUNCTION"],
+        processes=int(arguments["--processes"]),
+        max_runs_per_child=int(arguments["--max-runs-per-child"]),
+        max_rss=int(float(arguments["--max-rss"]) * 1024 * 1024),
+        poll_interval=float(arguments["--poll-interval"]),
+        max_tries=int(arguments["--max-tries"]),
+        heartbeat_interval=float(arguments["--heartbeat"]),
+        lease=float(arguments["--lease"]),
+        exit_when_idle=arguments["--exit-when-idle"],
+    )
+
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info("interrupted; exiting")
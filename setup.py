@@ -45,10 +45,11 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/andrewyates/profane",
-    packages=setuptools.find_packages(),
-    install_requires=["colorama", "docopt", "numpy>=1.17", "PyYAML>=5", "sqlalchemy", "sqlalchemy-utils"],
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    install_requires=["colorama", "docopt", "numpy>=1.17", "PyYAML>=5", "sqlalchemy>=2.0", "sqlalchemy-utils"],
     classifiers=["Programming Language :: Python :: 3", "Operating System :: OS Independent"],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     cmdclass={"develop": PostDevelopCommand, "install": PostInstallCommand},
     include_package_data=True,
+    entry_points={"console_scripts": ["profane=profane.__main__:main"]},
 )
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, module_registry
+
+BUILD_SECONDS = 0.2
+
+
+@pytest.fixture
+def benchmark_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+    builds = []
+
+    @ModuleBase.register
+    class Collection(ModuleBase):
+        module_type = "collection"
+        module_name = "files"
+        config_spec = [ConfigOption(key="part", default_value=1)]
+
+        async def build(self):
+            await asyncio.sleep(BUILD_SECONDS)
+            builds.append(f"collection{self.config['part']}")
+            self.docs = ["a", "b"]
+
+    @ModuleBase.register
+    class Qrels(ModuleBase):
+        module_type = "qrels"
+        module_name = "trec"
+
+        def build(self):
+            # synchronous builds run in threads, so they overlap with async builds too
+            time.sleep(BUILD_SECONDS)
+            builds.append("qrels")
+
+    @ModuleBase.register
+    class Benchmark(ModuleBase):
+        module_type = "benchmark"
+        module_name = "twoparts"
+        dependencies = [
+            Dependency(key="part1", module="collection", name="files", default_config_overrides={"part": 1}),
+            Dependency(key="part2", module="collection", name="files", default_config_overrides={"part": 2}),
+            Dependency(key="qrels", module="qrels", name="trec"),
+        ]
+
+        async def build(self):
+            # dependencies are built first
+            self.docs = self.part1.docs + self.part2.docs
+            builds.append("benchmark")
+
+    Benchmark.builds = builds
+    return Benchmark
+
+
+def test_acreate(benchmark_cls):
+    start = time.time()
+    benchmark = asyncio.run(benchmark_cls.acreate("twoparts"))
+    elapsed = time.time() - start
+
+    assert benchmark.docs == ["a", "b", "a", "b"]
+    assert sorted(benchmark.builds[:3]) == ["collection1", "collection2", "qrels"] and benchmark.builds[3] == "benchmark"
+    assert elapsed < 2 * BUILD_SECONDS
+
+    # the module is shared with synchronous code
+    assert benchmark_cls.create("twoparts") is benchmark
+    assert len(benchmark.builds) == 4
+
+
+def test_sync_create_with_async_build(benchmark_cls):
+    start = time.time()
+    benchmark = benchmark_cls.create("twoparts")
+    assert benchmark.docs == ["a", "b", "a", "b"]
+    assert time.time() - start >= 3 * BUILD_SECONDS
+
+    async def create_in_coroutine():
+        # an event loop is already running, so the build runs on another loop
+        return benchmark_cls.create("twoparts", {"part1": {"part": 3}})
+
+    benchmark = asyncio.run(create_in_coroutine())
+    assert benchmark.part1.config["part"] == 3 and benchmark.docs == ["a", "b", "a", "b"]
+
+
+def test_acreate_failure(benchmark_cls):
+    qrels_cls = module_registry.lookup("qrels", "trec")
+
+    def fail(self):
+        raise ValueError("missing qrels")
+
+    build, qrels_cls.build = qrels_cls.build, fail
+    with pytest.raises(ValueError, match="missing qrels"):
+        asyncio.run(benchmark_cls.acreate("twoparts"))
+
+    # the benchmark was never built, so it is not shared
+    assert "benchmark" not in benchmark_cls.builds
+    qrels_cls.build = build
+    assert benchmark_cls.create("twoparts").docs == ["a", "b", "a", "b"]
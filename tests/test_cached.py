@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from profane import ConfigOption, ModuleBase, cached, constants, module_registry
+
+
+@pytest.fixture
+def counter_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+
+    @ModuleBase.register
+    class Counter(ModuleBase):
+        module_type = "counter"
+        module_name = "counter"
+        config_spec = [ConfigOption(key="scale", default_value=2)]
+        calls = []
+
+        @cached
+        def scaled(self, x, offset=0):
+            self.calls.append(("scaled", x, offset))
+            return {"value": x * self.config["scale"] + offset}
+
+        @cached(serializer="npy")
+        def array(self, n):
+            self.calls.append(("array", n))
+            return np.arange(n) * self.config["scale"]
+
+        @cached(serializer="json")
+        def summary(self):
+            self.calls.append(("summary",))
+            return {"scale": self.config["scale"], "items": [1, 2]}
+
+    return Counter
+
+
+def test_cached_results(counter_cls):
+    counter = counter_cls()
+    assert counter.scaled(3) == {"value": 6}
+    assert counter.scaled(3) is counter.scaled(x=3, offset=0)
+    assert counter.scaled(3, offset=1) == {"value": 7}
+    assert counter.calls == [("scaled", 3, 0), ("scaled", 3, 1)]
+
+    # results are loaded from disk by other objects with the same config
+    other = counter_cls()
+    assert other.scaled(3) == {"value": 6}
+    assert counter.calls == [("scaled", 3, 0), ("scaled", 3, 1)]
+
+    # but not by objects with different configs
+    assert counter_cls({"scale": 3}).scaled(3) == {"value": 9}
+    assert len(counter.calls) == 3
+
+    assert np.array_equal(other.array(4), [0, 2, 4, 6])
+    assert np.array_equal(counter_cls().array(4), [0, 2, 4, 6])
+    assert counter_cls().summary() == {"scale": 2, "items": [1, 2]}
+    assert counter.calls[3:] == [("array", 4), ("summary",)]
+
+    files = sorted(path.name for path in (counter.get_cache_path() / "cached").iterdir())
+    assert len(files) == 4 and files[0].startswith("array-") and files[0].endswith(".npy")
+    assert files[-1] == "summary.json"
+
+
+def test_cached_partial_write(counter_cls):
+    class FailingSerializer:
+        extension = "bin"
+
+        def dump(self, obj, f):
+            f.write(b"partial")
+            raise IOError("disk full")
+
+        def load(self, f):
+            return f.read()
+
+    @ModuleBase.register
+    class Failing(counter_cls):
+        module_name = "failing"
+
+        @cached(serializer=FailingSerializer())
+        def scaled(self, x, offset=0):
+            return x
+
+    with pytest.raises(IOError):
+        Failing().scaled(1)
+
+    # neither the result nor the temporary file are left behind
+    assert list((Failing().get_cache_path() / "cached").iterdir()) == []
+
+
+def test_array_store(counter_cls):
+    counter = counter_cls()
+    store = counter.get_array_store()
+    assert store.path == counter.get_cache_path() / "arrays"
+    assert "lengths" not in store and store.names() == []
+    with pytest.raises(KeyError):
+        store.load("lengths")
+    with pytest.raises(ValueError):
+        store.load("../lengths")
+
+    lengths = store.save("lengths", np.arange(5, dtype=np.int32))
+    assert isinstance(lengths, np.memmap) and not lengths.flags.writeable
+    assert lengths.dtype == np.int32 and lengths.tolist() == [0, 1, 2, 3, 4]
+
+    # other objects with the same config map the same file
+    loaded = counter_cls().get_array_store().load("lengths")
+    assert isinstance(loaded, np.memmap) and str(loaded.filename) == str(store.path_for("lengths"))
+    assert np.array_equal(loaded, lengths)
+
+    scores = store.get_or_compute("scores", lambda: np.ones((2, 3)))
+    assert store.get_or_compute("scores", lambda: np.zeros((2, 3))).sum() == 6
+    assert isinstance(scores, np.memmap) and scores.shape == (2, 3)
+    assert store.names() == ["lengths", "scores"]
+
+
+def test_cached_memmap(counter_cls):
+    class MemmapCounter(counter_cls):
+        module_name = "memmap"
+
+        @cached(serializer="memmap")
+        def array(self, n):
+            self.calls.append(("array", n))
+            return np.arange(n)
+
+    ModuleBase.register(MemmapCounter)
+    first = MemmapCounter().array(3)
+    assert isinstance(first, np.memmap) and not first.flags.writeable
+    assert isinstance(MemmapCounter().array(3), np.memmap)
+    assert first.tolist() == [0, 1, 2] and len(MemmapCounter.calls) == 1
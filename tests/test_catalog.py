@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+import profane.catalog
+from profane import ConfigOption, Dependency, ModuleBase, cached, constants, module_registry
+from profane.catalog import CacheCatalog, flatten_module_config
+
+
+@pytest.fixture
+def searcher_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path / "cache"
+
+    @ModuleBase.register
+    class Collection(ModuleBase):
+        module_type = "collection"
+        module_name = "robust04"
+
+    @ModuleBase.register
+    class Index(ModuleBase):
+        module_type = "index"
+        module_name = "anserini"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+    @ModuleBase.register
+    class Searcher(ModuleBase):
+        module_type = "searcher"
+        module_name = "bm25"
+        dependencies = [Dependency(key="index", module="index", name="anserini")]
+        config_spec = [ConfigOption(key="k1", default_value=0.9)]
+
+    return Searcher
+
+
+def test_record_and_find(searcher_cls, tmp_path):
+    catalog = CacheCatalog(tmp_path / "catalog.db")
+
+    searcher = searcher_cls({"k1": 1.2})
+    assert flatten_module_config(searcher) == {
+        "name": "bm25",
+        "k1": "1.2",
+        "index.name": "anserini",
+        "index.stemmer": "porter",
+        "index.collection.name": "robust04",
+    }
+
+    entry_id = catalog.record(searcher)
+    for stemmer in ["porter", "krovetz", "none"]:
+        catalog.record(searcher_cls({"index": {"stemmer": stemmer}}).index)
+
+    assert [entry.path for entry in catalog.find(module_type="searcher")] == [str(searcher.get_cache_path())]
+    assert catalog.find(module_type="searcher")[0].config["index.stemmer"] == "porter"
+    assert len(catalog.find(module_type="index")) == 3
+    assert len(catalog.find(config={"stemmer": "porter"})) == 1
+    assert len(catalog.find(config={"index.stemmer": "porter", "k1": 1.2})) == 1
+    assert (
+        catalog.find(module_type="index", config={"stemmer": "krovetz", "collection.name": "robust04"})[0].module_name
+        == "anserini"
+    )
+    assert catalog.find(config={"index.stemmer": "krovetz"}) == []
+
+    # recording a path again updates its entry
+    entry = catalog.find(module_type="searcher")[0]
+    assert entry.size is None
+    searcher.get_cache_path().mkdir(parents=True)
+    with open(searcher.get_cache_path() / "data", "wt") as f:
+        f.write("x" * 10)
+
+    time.sleep(0.01)
+    assert catalog.record(searcher) == entry_id
+    updated = catalog.find(module_type="searcher", materialized=True)[0]
+    assert updated.size == 10
+    assert updated.access_time > entry.access_time
+
+    # entries whose paths do not exist are pruned (the porter index's path is a parent of the searcher's path)
+    catalog.refresh(prune=True)
+    assert [entry.config.get("index.stemmer", entry.config.get("stemmer")) for entry in catalog.find()] == ["porter", "porter"]
+    catalog.remove(searcher.get_cache_path())
+    assert [entry.module_type for entry in catalog.find()] == ["index"]
+
+
+def test_automatic_recording(searcher_cls, tmp_path):
+    constants["CACHE_CATALOG"] = tmp_path / "catalog.db"
+
+    searcher = searcher_cls()
+    searcher.get_cache_path()
+    searcher.index.get_cache_path()
+    searcher_cls.resolve({"k1": 0.5}).get_cache_path()
+
+    catalog = CacheCatalog(tmp_path / "catalog.db")
+    assert {entry.config["k1"] for entry in catalog.find(module_type="searcher")} == {"0.9", "0.5"}
+    assert [entry.path for entry in catalog.find(module_type="index")] == [str(searcher.index.get_cache_path())]
+
+
+def test_automatic_recording_does_not_walk_caches(searcher_cls, tmp_path, monkeypatch):
+    constants["CACHE_CATALOG"] = tmp_path / "catalog.db"
+
+    class Searcher(searcher_cls):
+        @cached(serializer="json")
+        def results(self, query):
+            return ["doc" + query] * 100
+
+    def walk(path):
+        raise AssertionError(f"walked {path}")
+
+    monkeypatch.setattr(profane.catalog, "_path_size", walk)
+    searcher = Searcher()
+    searcher.results("1")
+    searcher.results("2")
+
+    # each cached result adds the size of its file to the entry
+    cached_dir = searcher.get_cache_path() / "cached"
+    entry = CacheCatalog(tmp_path / "catalog.db").find(module_type="searcher", materialized=True)[0]
+    assert entry.size == sum(path.stat().st_size for path in cached_dir.iterdir())
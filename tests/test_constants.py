@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, module_registry
+from profane.cache import SharedObjectCache
+from profane.constants import ConstantsRegistry
+
+
+def test_scope():
+    registry = ConstantsRegistry()
+    registry["CACHE_BASE_PATH"] = "/global"
+
+    with registry.scope(RANDOM_SEED=7, CACHE_BASE_PATH="/seed7"):
+        assert registry["RANDOM_SEED"] == 7 and registry["CACHE_BASE_PATH"] == "/seed7"
+
+        # constants assigned in a scope are write-once and only visible in that scope
+        registry["BUILD_LOCK"] = "file"
+        with pytest.raises(TypeError):
+            registry["RANDOM_SEED"] = 8
+
+        with registry.scope(RANDOM_SEED=8):
+            assert registry["RANDOM_SEED"] == 8 and registry["BUILD_LOCK"] == "file"
+        assert registry["RANDOM_SEED"] == 7
+
+    assert "RANDOM_SEED" not in registry and "BUILD_LOCK" not in registry
+    assert registry["CACHE_BASE_PATH"] == "/global" and len(registry) == 1
+
+
+@pytest.fixture
+def task_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+
+    @ModuleBase.register
+    class Collection(ModuleBase):
+        module_type = "collection"
+        module_name = "robust04"
+
+        def build(self):
+            time.sleep(0.1)
+            self.cache_path = self.get_cache_path()
+
+    @ModuleBase.register
+    class Sampler(ModuleBase):
+        module_type = "sampler"
+        module_name = "random"
+        requires_random_seed = True
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        config_spec = [ConfigOption(key="n", default_value=3)]
+
+        def build(self):
+            # the shared collection may have been created by another pipeline, but it is always built first
+            self.collection_path = self.collection.cache_path
+            self.cache_path = self.get_cache_path()
+            self.sample = self.rng.integers(0, 1000, self.config["n"]).tolist()
+
+    return Sampler
+
+
+def _create_in_scope(task_cls, seed, results):
+    with constants.scope(RANDOM_SEED=seed):
+        results[seed] = task_cls.create("random")
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_threads_with_different_seeds(task_cls, tmp_path, workers):
+    if workers:
+        constants["BUILD_WORKERS"] = workers
+
+    results = {}
+    threads = [threading.Thread(target=_create_in_scope, args=(task_cls, seed, results)) for seed in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results[1].config["seed"] == 1 and results[2].config["seed"] == 2
+    assert results[1].sample != results[2].sample
+    assert results[1].cache_path != results[2].cache_path
+
+    # the collection does not depend on the seed, so both pipelines share it (and it was built before either sampler)
+    assert results[1].collection is results[2].collection
+    assert results[1].collection_path == results[2].collection_path == results[1].collection.cache_path
+
+    # the same seed produces the same object (and results) again
+    with constants.scope(RANDOM_SEED=1):
+        assert task_cls.create("random") is results[1]
+
+    assert "RANDOM_SEED" not in constants and constants["CACHE_BASE_PATH"] == tmp_path
+
+
+def test_scopes_with_different_cache_paths(task_cls, tmp_path):
+    collections = {}
+    for root in ["a", "b", "a"]:
+        with constants.scope(CACHE_BASE_PATH=tmp_path / root):
+            collection = module_registry.lookup("collection", "robust04").create("robust04")
+            collections.setdefault(root, collection)
+            assert collections[root] is collection
+
+            # the module's cache is under the scope's cache path, where it was built
+            assert collection.cache_path == collection.get_cache_path()
+            assert collection.cache_path.relative_to(tmp_path / root)
+
+    assert collections["a"] is not collections["b"]
+
+    # a scope that does not move the cache shares modules with code outside of scopes
+    collection = module_registry.lookup("collection", "robust04").create("robust04")
+    with constants.scope(CACHE_BASE_PATH=tmp_path, RANDOM_SEED=1):
+        assert module_registry.lookup("collection", "robust04").create("robust04") is collection
+
+
+def test_asyncio_tasks_with_different_seeds(task_cls, tmp_path):
+    constants["BUILD_WORKERS"] = 2
+
+    async def create(seed):
+        with constants.scope(RANDOM_SEED=seed, CACHE_BASE_PATH=tmp_path / f"seed{seed}"):
+            await asyncio.sleep(0)
+            return await task_cls.acreate("random")
+
+    async def main():
+        return await asyncio.gather(create(1), create(2), create(1))
+
+    first, second, third = asyncio.run(main())
+    assert (first.config["seed"], second.config["seed"]) == (1, 2) and first is third
+    assert first.cache_path.parts[-3] == "seed1" and second.cache_path.parts[-3] == "seed2"
+
+
+def test_many_threads_with_bounded_shared_objects(task_cls):
+    module_registry.shared_objects = SharedObjectCache(maxsize=4)
+
+    def estimate_memory_size(self):
+        # give other threads a chance to use the cache while an object is being added
+        time.sleep(0.001)
+        return 10
+
+    task_cls.estimate_memory_size = estimate_memory_size
+    results, errors = {}, []
+
+    def create(seed):
+        try:
+            for n in range(1, 10):
+                with constants.scope(RANDOM_SEED=seed % 4):
+                    results[(seed, n)] = task_cls.create("random", {"n": n})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create, args=(seed,)) for seed in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    shared_objects = module_registry.shared_objects
+    assert len(shared_objects._strong) == 4 and shared_objects.bytes == sum(shared_objects._sizes.values())
+    assert shared_objects.bytes == 10 * sum(obj.module_type == "sampler" for obj in shared_objects._strong.values())
+
+    # threads using the same seed received the same objects
+    for (seed, n), sampler in results.items():
+        assert sampler.config["seed"] == seed % 4 and len(sampler.sample) == n
+        assert sampler is results[(seed % 4, n)]
+
+
+def test_threads_wait_for_shared_dependencies(task_cls):
+    collection_cls = module_registry.lookup("collection", "robust04")
+    builds = []
+    collection_build = collection_cls.build
+
+    def build(self):
+        builds.append(self)
+        collection_build(self)
+
+    collection_cls.build = build
+    results = {}
+
+    def create(seed):
+        with constants.scope(RANDOM_SEED=seed):
+            results[seed] = task_cls.create("random")
+
+    threads = [threading.Thread(target=create, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # the first thread builds the collection while the others wait for it
+    assert len(builds) == 1
+    assert all(sampler.collection is builds[0] for sampler in results.values())
+
+
+def test_reservations_in_different_orders():
+    cache = SharedObjectCache()
+    reserved = threading.Barrier(2)
+    yielded = {}
+
+    def reserve(first, second):
+        with cache.reserve(first):
+            reserved.wait()
+            if first == "b":
+                # wait until the other thread is waiting for "b"
+                while not cache._waiting_for:
+                    time.sleep(0.01)
+
+            with cache.reserve(second) as obj:
+                yielded[second] = obj
+                cache[second] = second
+
+            # like ModuleBase.create, add the object before releasing the reservation
+            cache[first] = first
+
+    threads = [threading.Thread(target=reserve, args=args, daemon=True) for args in [("a", "b"), ("b", "a")]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # waiting for "a" would deadlock, so the second thread does not wait. the first thread waits for "b" and receives it
+    assert not any(thread.is_alive() for thread in threads)
+    assert yielded == {"a": None, "b": "b"}
@@ -1,3 +1,8 @@
+import gc
+import pickle
+import weakref
+from copy import deepcopy
+
 import pytest
 
 from profane import FrozenDict
@@ -31,3 +36,72 @@ def test_copy():
 
     modified = FrozenDict({1: 11, 3: 4, "inner": {5: 7, "more": {7: 8, 9: 12}}})
     assert FrozenDict(unfrozen) == modified
+
+    # mutable values nested in lists are copied too
+    d = FrozenDict({"x": [1, {"y": 2}], "tuple": [3, 4]})
+    unfrozen = d.unfrozen_copy()
+    unfrozen["x"][1]["y"] = 3
+    assert d["x"][1] == {"y": 2}
+    assert unfrozen["tuple"] is d["tuple"]
+
+
+def test_equality():
+    d = FrozenDict({1: 2, "tuple": [9, 8], "inner": {"a": "b", "more": {"c": "d"}}})
+
+    assert d == {1: 2, "tuple": [9, 8], "inner": {"a": "b", "more": {"c": "d"}}}
+    assert d == {1: 2, "tuple": (9, 8), "inner": FrozenDict({"a": "b", "more": {"c": "d"}})}
+    assert d != {1: 2, "tuple": [9, 8], "inner": {"a": "b", "more": {"c": "e"}}}
+    assert d != {1: 2, "tuple": [9, 8]}
+    assert d != [1, "tuple", "inner"]
+
+    other = FrozenDict(d.unfrozen_copy())
+    assert d == other and hash(d) == hash(other)
+    assert d != FrozenDict({1: 3, "tuple": [9, 8], "inner": {"a": "b", "more": {"c": "d"}}})
+
+    # nested FrozenDicts are reused rather than rebuilt
+    assert FrozenDict(d)["inner"] is d["inner"]
+    assert FrozenDict({"outer": d})["outer"] is d
+
+
+def test_slots_and_pickle():
+    d = FrozenDict({"inner": {"a": "b"}})
+    assert not hasattr(d, "__dict__")
+
+    hash(d)
+    copied = pickle.loads(pickle.dumps(d))
+    assert copied == d and hash(copied) == hash(d)
+    assert isinstance(copied["inner"], FrozenDict)
+    assert deepcopy(d) is d
+
+
+def test_interning():
+    d = FrozenDict({"x": 1, "inner": {"a": "b", "tuple": [1, 2]}})
+
+    # equal configs and sub-configs share one instance
+    assert FrozenDict({"x": 1, "inner": {"a": "b", "tuple": (1, 2)}}) is d
+    assert FrozenDict({"y": 2, "inner": {"a": "b", "tuple": [1, 2]}})["inner"] is d["inner"]
+    assert FrozenDict(d.unfrozen_copy()) is d
+    assert pickle.loads(pickle.dumps(d)) is d
+
+    # values with different types are not interned together
+    for value in [True, 1.0, "1"]:
+        other = FrozenDict({"x": value, "inner": {"a": "b", "tuple": [1, 2]}})
+        assert other is not d
+        assert type(other["x"]) is type(value)
+    assert type(FrozenDict({"x": 1, "inner": {"a": "b", "tuple": [True, 2]}})["inner"]["tuple"][0]) is bool
+
+    # the order of keys is kept
+    reordered = FrozenDict({"inner": {"tuple": [1, 2], "a": "b"}, "x": 1})
+    assert reordered is not d and reordered == d and hash(reordered) == hash(d)
+    assert list(reordered) == ["inner", "x"] and list(reordered["inner"]) == ["tuple", "a"]
+    assert list(FrozenDict({"x": 1, "inner": {"a": "b", "tuple": [1, 2]}})) == ["x", "inner"]
+
+    # unused configs are not kept alive by the intern table
+    ref = weakref.ref(FrozenDict({"unused": {"config": 1}}))
+    gc.collect()
+    assert ref() is None
+
+    # configs with unhashable values are not interned
+    unhashable = FrozenDict({"x": ({"a": 1},)})
+    assert FrozenDict({"x": ({"a": 1},)}) is not unhashable
+    assert FrozenDict({"x": ({"a": 1},)}) == unhashable
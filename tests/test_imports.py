@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+# generous enough for slow CI machines, but well below the ~0.5s it takes to import SQLAlchemy and NumPy eagerly
+IMPORT_TIME_BUDGET = 0.4
+
+
+def _run(code):
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.split()
+
+
+def test_lazy_imports():
+    heavy = ["numpy", "sqlalchemy", "yaml", "colorama", "profane.sql"]
+    loaded = _run(f"import sys, profane; print(*[m for m in {heavy!r} if m in sys.modules])")
+    assert loaded == []
+
+    # the lazily imported attributes still resolve
+    assert _run("import profane; print(profane.DBManager.__name__, 'DBManager' in dir(profane))") == ["DBManager", "True"]
+    assert _run("from profane import CacheCatalog, Worker; print(CacheCatalog.__name__)") == ["CacheCatalog"]
+
+    # NumPy is imported once a module needs an RNG
+    code = """
+import sys, profane
+class Seeded(profane.ModuleBase):
+    module_type, module_name = "seeded", "seeded"
+    requires_random_seed = True
+print("numpy" in sys.modules)
+Seeded()
+print("numpy" in sys.modules)
+"""
+    assert _run(code) == ["False", "True"]
+
+
+def test_import_time():
+    code = "import time; start = time.perf_counter(); import profane; print(time.perf_counter() - start)"
+    # take the best of a few runs to avoid failing because of an unrelated load spike
+    elapsed = min(float(_run(code)[0]) for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET
@@ -0,0 +1,86 @@
+import datetime
+import multiprocessing
+import time
+
+import pytest
+
+from profane import ConfigOption, ModuleBase, constants, module_registry
+from profane.sql import BuildLease, DBManager
+
+
+class SlowIndex(ModuleBase):
+    """Builds its cache by checking for an artifact and then slowly creating it, which races without a build lock"""
+
+    module_type = "index"
+    module_name = "slow"
+    config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+    def build(self):
+        path = self.get_cache_path()
+        path.mkdir(parents=True, exist_ok=True)
+        if not (path / "done").exists():
+            with open(path.parent / "builds", "at") as f:
+                f.write(f"{self.config['stemmer']}\n")
+            time.sleep(0.3)
+            (path / "done").touch()
+
+        self.loaded = True
+
+
+def _create_index(stemmer):
+    index = SlowIndex({"stemmer": stemmer})
+    assert index.loaded
+
+
+def _build_concurrently(stemmers):
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_create_index, args=(stemmer,)) for stemmer in stemmers]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+    ModuleBase.register(SlowIndex)
+    return tmp_path
+
+
+@pytest.mark.parametrize("method", ["file", "db"])
+def test_build_once(cache_path, method):
+    constants["BUILD_LOCK"] = "file" if method == "file" else f"sqlite:///{cache_path}/locks.db"
+
+    start = time.time()
+    _build_concurrently(["porter"] * 4 + ["krovetz"] * 2)
+
+    with open(cache_path / "builds", "rt") as f:
+        assert sorted(f.read().split()) == ["krovetz", "porter"]
+
+    # each config was built once, and builds of different configs ran concurrently
+    assert time.time() - start < 4 * 0.3 + 2
+
+
+def test_stale_build_lease(tmp_path):
+    db = DBManager(f"sqlite:///{tmp_path}/locks.db")
+    with db.build_lease("key"):
+        with db.engine.begin() as conn:
+            assert conn.execute(BuildLease.__table__.select()).one().key == "key"
+
+    # a lease whose holder stopped recording heartbeats is taken over
+    old = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=600)
+    with db.engine.begin() as conn:
+        conn.execute(BuildLease.__table__.insert().values(key="key", holder="dead", acquire_time=old, heartbeat_time=old))
+
+    start = time.time()
+    with db.build_lease("key", lease=300):
+        with db.engine.begin() as conn:
+            assert conn.execute(BuildLease.__table__.select()).one().holder != "dead"
+    assert time.time() - start < 1
+
+    with db.engine.begin() as conn:
+        assert conn.execute(BuildLease.__table__.select()).all() == []
@@ -0,0 +1,112 @@
+import json
+import sys
+
+import pytest
+
+from profane import constants, module_registry
+from profane.__main__ import main
+from profane.manifest import load_manifest, scan_package
+
+FILES = {
+    "__init__.py": "",
+    "models/__init__.py": "from profane import import_all_modules\n\nimport_all_modules(__file__, __package__)\n",
+    "models/base.py": "from profane import ModuleBase\n\n\nclass Model(ModuleBase):\n    module_type = 'model'\n",
+    "models/light.py": """
+from profane import Dependency
+from lazypkg.models.base import Model
+
+
+@Model.register
+class Light(Model):
+    module_name = "light"
+    dependencies = [Dependency(key="tokenizer", module="tokenizer", name="simple")]
+""",
+    "models/heavy.py": """
+import nonexistent_heavy_library
+from lazypkg.models.base import Model
+
+
+@Model.register
+class Heavy(Model):
+    module_name = "heavy"
+""",
+    "tokenizer/__init__.py": "from profane import import_all_modules\n\nimport_all_modules(__file__, __package__)\n",
+    "tokenizer/simple.py": """
+from profane import ModuleBase
+
+
+class Tokenizer(ModuleBase):
+    module_type = "tokenizer"
+
+
+@Tokenizer.register
+class Simple(Tokenizer):
+    module_name = "simple"
+
+
+def not_a_module():
+    class Helper:
+        pass
+""",
+}
+
+
+@pytest.fixture
+def package_dir(tmp_path, monkeypatch):
+    module_registry.reset()
+    constants.reset()
+    constants["BASE_PACKAGE"] = "lazypkg"
+
+    for fn, contents in FILES.items():
+        path = tmp_path / "lazypkg" / fn
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path / "lazypkg"
+
+    for name in list(sys.modules):
+        if name.startswith("lazypkg"):
+            del sys.modules[name]
+    module_registry.reset()
+
+
+def test_scan_package(package_dir):
+    assert scan_package(package_dir) == {
+        ("model", "light"): "lazypkg.models.light",
+        ("model", "heavy"): "lazypkg.models.heavy",
+        ("tokenizer", "simple"): "lazypkg.tokenizer.simple",
+    }
+
+    main(["manifest", str(package_dir)])
+    assert load_manifest(package_dir / "profane_manifest.json") == scan_package(package_dir)
+    with open(package_dir / "profane_manifest.json", "rt") as f:
+        assert len(json.load(f)["modules"]) == 3
+
+
+def test_lazy_lookup(package_dir):
+    # importing the package imports every model, including ones with missing dependencies
+    with pytest.raises(ModuleNotFoundError):
+        import lazypkg.models
+
+    for name in list(sys.modules):
+        if name.startswith("lazypkg"):
+            del sys.modules[name]
+    module_registry.reset()
+
+    # with a manifest, only the modules that are needed are imported
+    module_registry.use_manifest(scan_package(package_dir))
+    import lazypkg.models
+
+    assert "lazypkg.models.light" not in sys.modules
+    assert module_registry.get_module_names("model") == ["heavy", "light"]
+
+    light = module_registry.lookup("model", "light")()
+    assert light.tokenizer.module_name == "simple"
+    assert "lazypkg.models.light" in sys.modules and "lazypkg.tokenizer.simple" in sys.modules
+    assert "lazypkg.models.heavy" not in sys.modules
+
+    with pytest.raises(ModuleNotFoundError):
+        module_registry.lookup("model", "heavy")
+    with pytest.raises(ValueError):
+        module_registry.lookup("model", "missing")
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, module_registry
+
+BUILD_SECONDS = 0.2
+
+
+@pytest.fixture
+def rank_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+    builds = []
+
+    class Slow(ModuleBase):
+        fail = False
+
+        def build(self):
+            # every dependency (including provided dependencies) has been built already
+            assert all(getattr(dependency, "built", True) for dependency in self._dependency_objects.values())
+
+            time.sleep(BUILD_SECONDS)
+            if self.fail:
+                raise ValueError(f"failed to build {self.module_type}")
+
+            builds.append((self.module_type, threading.get_ident()))
+            self.built = True
+
+    @ModuleBase.register
+    class Collection(Slow):
+        module_type = "collection"
+        module_name = "robust04"
+
+    @ModuleBase.register
+    class Benchmark(Slow):
+        module_type = "benchmark"
+        module_name = "rob04yang"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+
+    @ModuleBase.register
+    class Index(Slow):
+        module_type = "index"
+        module_name = "anserini"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+    @ModuleBase.register
+    class Searcher(Slow):
+        module_type = "searcher"
+        module_name = "bm25"
+        dependencies = [Dependency(key="index", module="index", name="anserini"), Dependency(key="benchmark", module="benchmark")]
+
+    @ModuleBase.register
+    class TwoRank(Slow):
+        module_type = "task"
+        module_name = "tworank"
+        dependencies = [
+            Dependency(key="benchmark", module="benchmark", name="rob04yang", provide_this=True, provide_children=["collection"]),
+            Dependency(key="searcher1", module="searcher", name="bm25"),
+            Dependency(key="searcher2", module="searcher", name="bm25", default_config_overrides={"index": {"stemmer": "none"}}),
+        ]
+
+    TwoRank.builds = builds
+    return TwoRank
+
+
+def _elapsed_builds(rank_cls):
+    start = time.time()
+    rank = rank_cls.create("tworank")
+    return rank, (time.time() - start) / BUILD_SECONDS
+
+
+def test_serial_builds(rank_cls):
+    rank, elapsed = _elapsed_builds(rank_cls)
+    assert len(rank.builds) == 7 and elapsed >= 7
+
+
+def test_parallel_builds(rank_cls):
+    constants["BUILD_WORKERS"] = 4
+    rank, elapsed = _elapsed_builds(rank_cls)
+
+    # the benchmark is provided to the searchers, so the critical path is collection -> benchmark -> searcher -> tworank
+    # (the two indexes are built at the same time as the benchmark, and the two searchers at the same time as each other)
+    order = [module_type for module_type, _ in rank.builds]
+    assert sorted(order) == ["benchmark", "collection", "index", "index", "searcher", "searcher", "task"]
+    assert order[0] == "collection" and order[-1] == "task"
+    assert len({thread for _, thread in rank.builds}) > 1
+    assert 4 <= elapsed < 6
+    assert rank.searcher1.benchmark is rank.benchmark and rank.searcher1.index.config["stemmer"] == "porter"
+
+    # shared objects are built once and reused
+    rank_cls.builds.clear()
+    assert rank_cls.create("tworank") is rank
+    assert rank_cls.builds == []
+
+
+def test_parallel_build_failure(rank_cls):
+    constants["BUILD_WORKERS"] = 4
+    module_registry.lookup("index", "anserini").fail = True
+
+    with pytest.raises(ValueError, match="failed to build index"):
+        rank_cls.create("tworank")
+
+    # modules that were not built are not shared, so they are built when the pipeline is created again
+    module_registry.lookup("index", "anserini").fail = False
+    rank_cls.builds.clear()
+    rank = rank_cls.create("tworank")
+    assert sorted(module_type for module_type, _ in rank.builds) == ["index", "index", "searcher", "searcher", "task"]
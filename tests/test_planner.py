@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from profane import ConfigOption, Dependency, ModuleBase, constants, expand_sweep, module_registry
+from profane.planner import RunPlan
+from profane.sql import DBManager, Run
+
+
+@pytest.fixture
+def rank_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+    builds = []
+
+    class Counted(ModuleBase):
+        def build(self):
+            time.sleep(0.05)
+            builds.append(self.module_type)
+
+    @ModuleBase.register
+    class Collection(Counted):
+        module_type = "collection"
+        module_name = "robust04"
+
+    @ModuleBase.register
+    class Benchmark(Counted):
+        module_type = "benchmark"
+        module_name = "rob04yang"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+
+    @ModuleBase.register
+    class Index(Counted):
+        module_type = "index"
+        module_name = "anserini"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+    @ModuleBase.register
+    class Searcher(Counted):
+        module_type = "searcher"
+        module_name = "bm25"
+        dependencies = [Dependency(key="index", module="index", name="anserini")]
+        config_spec = [ConfigOption(key="b", default_value=0.4)]
+
+    @ModuleBase.register
+    class Rank(ModuleBase):
+        module_type = "task"
+        module_name = "rank"
+        dependencies = [
+            Dependency(key="benchmark", module="benchmark", name="rob04yang", provide_children=["collection"]),
+            Dependency(key="searcher", module="searcher", name="bm25"),
+        ]
+        executed = []
+
+        def run(self):
+            if self.searcher.config["b"] == 0.9:
+                raise ValueError("unlucky b")
+            self.executed.append(self)
+
+    Rank.builds = builds
+    return Rank
+
+
+def run_rank(command, config):
+    task = module_registry.lookup("task", command).create(command, config)
+    task.run()
+
+
+def test_plan_shared_modules(rank_cls):
+    configs = list(expand_sweep("searcher.b=0.1..0.5,0.1 x searcher.index.stemmer=porter,krovetz", module_cls=rank_cls))
+    plan = RunPlan([("rank", config) for config in configs], lambda command: module_registry.lookup("task", command))
+
+    # the collection and benchmark are shared by all 10 runs, and each index by 5 runs
+    assert len(plan.runs) == 10 and len(plan.modules) == 2 + 2 + 10
+    assert sorted(module.module_type for module in plan.shared_modules()) == ["benchmark", "collection", "index", "index"]
+    assert list(plan.modules.values())[0].module_type == "collection"
+
+    start = time.time()
+    plan.build(workers=4)
+    assert sorted(rank_cls.builds) == sorted(["collection", "benchmark"] + ["index"] * 2 + ["searcher"] * 10)
+    # the critical path is collection -> index -> searcher, and 4 searchers are built at a time
+    assert time.time() - start < 9 * 0.05
+
+    plan.execute(run_rank)
+    assert len(rank_cls.executed) == 10 and len(rank_cls.builds) == 14
+    assert len({id(task.benchmark.collection) for task in rank_cls.executed}) == 1
+    assert len({id(task.searcher.index) for task in rank_cls.executed}) == 2
+
+
+def test_plan_queued_runs(rank_cls, tmp_path):
+    db = DBManager(f"sqlite:///{tmp_path}/runs.db")
+    db.queue_runs(("rank", {"searcher": {"b": b}}, 0) for b in ["0.1", "0.9", "0.5"])
+
+    runs = db.claim_runs(n=10)
+    plan = RunPlan(runs, lambda command: module_registry.lookup("task", command), db=db, heartbeat_interval=0.02)
+    plan.build()
+    # heartbeats are recorded for every claimed run while the batch's modules are built, so none of them look stale
+    assert db.clear_stale_runs(lease=0.15) == []
+    failed = plan.execute(run_rank)
+    assert not any(thread.name.startswith("heartbeat-") for thread in threading.enumerate())
+
+    with db.session_scope() as session:
+        statuses = {run.run_id: run.status for run in session.query(Run)}
+    assert len(failed) == 1 and failed[0].config == {"searcher": {"b": "0.9"}}
+    assert sorted(statuses.values()) == ["COMPLETED", "COMPLETED", "FAILED"]
+    assert statuses[failed[0].run_id] == "FAILED"
+    assert len(rank_cls.executed) == 2 and rank_cls.builds.count("index") == 1
@@ -0,0 +1,152 @@
+import datetime
+import multiprocessing
+import subprocess
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from profane.sql import DBManager, Run
+
+
+@pytest.fixture
+def db(tmpdir):
+    return DBManager(f"sqlite:///{tmpdir}/runs.db")
+
+
+def test_queue_runs(db):
+    single_id = db.queue_run("rank.run", {"searcher": {"b": "0.1"}}, priority=3)
+
+    runs = [("rank.run", {"searcher": {"b": str(b)}}, b) for b in range(25)]
+    run_ids = db.queue_runs(iter(runs), chunk_size=10)
+    assert len(run_ids) == 25
+    assert single_id not in run_ids
+
+    with db.session_scope() as session:
+        for run_id, (command, config, priority) in zip(run_ids, runs):
+            run = session.query(Run).filter(Run.run_id == run_id).one()
+            assert run.command == command
+            assert run.config == config
+            assert run.priority == priority
+            assert run.status == "QUEUED"
+            assert run.tries == 0
+
+    assert db.queue_runs([]) == []
+
+
+def test_claim_runs(db):
+    low_ids = db.queue_runs(("rank.run", {"run": idx}, 0) for idx in range(5))
+    high_ids = db.queue_runs(("rank.run", {"run": idx}, 1) for idx in range(5, 8))
+
+    runs = db.claim_runs(n=4)
+    assert len(runs) == 4
+    assert sorted(run.run_id for run in runs[:3]) == high_ids
+    assert runs[3].run_id in low_ids
+    assert all(run.status == "RUNNING" and run.tries == 1 for run in runs)
+
+    # claimed runs are not eligible anymore
+    remaining = db.claim_runs(n=10)
+    assert len(remaining) == 4
+    assert set(run.run_id for run in runs + remaining) == set(low_ids + high_ids)
+    assert db.claim_run() is None
+
+    # failed runs are eligible until they reach max_tries
+    db.failed_event(runs[0])
+    assert db.claim_run(max_tries=1) is None
+    run = db.claim_run(max_tries=2)
+    assert run.run_id == runs[0].run_id
+    assert run.tries == 2
+
+
+def test_upgrade_schema(tmpdir):
+    url = f"sqlite:///{tmpdir}/old.db"
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                "CREATE TABLE run (run_id INTEGER PRIMARY KEY, command VARCHAR, config JSON, hostname VARCHAR, pid INTEGER, status VARCHAR(11), priority INTEGER, tries INTEGER, start_time DATETIME, stop_time DATETIME, queue_time DATETIME)"
+            )
+        )
+        conn.execute(
+            sa.text("INSERT INTO run (command, config, status, priority, tries) VALUES ('rank.run', '{}', 'QUEUED', 0, 0)")
+        )
+
+    db = DBManager(url)
+    run = db.claim_run()
+    assert run.status == "RUNNING"
+    assert 0 <= run.claim_key < 1
+
+
+def _claim_until_empty(url, n, results):
+    db = DBManager(url)
+    claimed = []
+    while True:
+        runs = db.claim_runs(n=n)
+        if not runs:
+            break
+        claimed.extend(run.run_id for run in runs)
+    results.put(claimed)
+
+
+def test_concurrent_claims_sqlite(tmpdir):
+    url = f"sqlite:///{tmpdir}/runs.db"
+    db = DBManager(url)
+    run_ids = db.queue_runs(("rank.run", {"run": idx}, idx % 3) for idx in range(300))
+
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_claim_until_empty, args=(url, n, results)) for n in (1, 1, 2, 5)]
+    for process in processes:
+        process.start()
+    claimed = [run_id for _ in processes for run_id in results.get()]
+    for process in processes:
+        process.join()
+
+    # every run is claimed exactly once
+    assert sorted(claimed) == run_ids
+
+
+def _get_run(db, run_id):
+    with db.session_scope() as session:
+        return session.query(Run).filter(Run.run_id == run_id).one()
+
+
+def test_clear_stale_runs(db):
+    db.queue_runs(("rank.run", {"run": idx}, 0) for idx in range(2))
+    stale, alive = db.claim_runs(n=2)
+    assert stale.heartbeat_time is not None
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            sa.update(Run)
+            .where(Run.run_id == stale.run_id)
+            .values(heartbeat_time=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=120))
+        )
+
+    assert db.clear_stale_runs(lease=60) == [stale.run_id]
+    assert _get_run(db, stale.run_id).status == "FAILED"
+    assert _get_run(db, alive.run_id).status == "RUNNING"
+    assert db.clear_stale_runs(lease=60) == []
+
+    # the heartbeat thread keeps the run alive
+    before = _get_run(db, alive.run_id).heartbeat_time
+    with db.heartbeat(alive, interval=0.05):
+        time.sleep(0.3)
+    assert _get_run(db, alive.run_id).heartbeat_time > before
+    assert db.clear_stale_runs(lease=0.2) == []
+
+
+def test_clear_zombie_runs(db):
+    db.queue_runs(("rank.run", {"run": idx}, 0) for idx in range(2))
+    zombie, alive = db.claim_runs(n=2)
+
+    finished = subprocess.Popen(["true"])
+    finished.wait()
+    with db.engine.begin() as conn:
+        conn.execute(sa.update(Run).where(Run.run_id == zombie.run_id).values(pid=finished.pid))
+
+    db.clear_zombie_runs()
+    assert _get_run(db, zombie.run_id).status == "FAILED"
+    assert _get_run(db, alive.run_id).status == "RUNNING"
@@ -0,0 +1,89 @@
+import pytest
+
+from profane.base import ModuleBase, ConfigOption, Dependency, InvalidConfigError, module_registry, constants
+from profane.sweep import expand_sweep, sweep_string_to_axes
+
+
+@pytest.fixture
+def sweep_modules():
+    module_registry.reset()
+    constants.reset()
+
+    class Task(ModuleBase):
+        module_type = "task"
+
+    @Task.register
+    class RankTask(Task):
+        module_name = "rank"
+        dependencies = [
+            Dependency(key="index", module="index", name="anserini", provide_this=True),
+            Dependency(key="searcher", module="searcher", name="bm25"),
+        ]
+
+    @ModuleBase.register
+    class SearcherBM25(ModuleBase):
+        module_type = "searcher"
+        module_name = "bm25"
+        dependencies = [Dependency(key="index", module="index", name="anserini")]
+        config_spec = [ConfigOption(key="b", default_value=0.4), ConfigOption(key="k1", default_value=0.9)]
+
+    @ModuleBase.register
+    class IndexAnserini(ModuleBase):
+        module_type = "index"
+        module_name = "anserini"
+        config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+        def build(self):
+            raise RuntimeError("sweeps should never build modules")
+
+    return RankTask
+
+
+def test_sweep_string_to_axes():
+    axes = sweep_string_to_axes("a=1..3,1 x b=x,y c=1,2 x d=0.1..0.3,0.1 e=foo")
+    assert axes == [
+        [[("a", "1")], [("a", "2")], [("a", "3")]],
+        [[("b", "x"), ("c", "1")], [("b", "y"), ("c", "2")]],
+        [[("d", "0.1"), ("e", "foo")], [("d", "0.2"), ("e", "foo")], [("d", "0.3"), ("e", "foo")]],
+    ]
+
+    with pytest.raises(ValueError):
+        sweep_string_to_axes("a=1,2 b=1,2,3")
+
+    with pytest.raises(ValueError):
+        sweep_string_to_axes("a=1 x x b=2")
+
+
+def test_expand_sweep_without_module():
+    configs = expand_sweep("a.b=1,2 x c=3,4", config={"d": "5"})
+    assert not isinstance(configs, list)
+    assert list(configs) == [
+        {"d": "5", "a": {"b": "1"}, "c": "3"},
+        {"d": "5", "a": {"b": "1"}, "c": "4"},
+        {"d": "5", "a": {"b": "2"}, "c": "3"},
+        {"d": "5", "a": {"b": "2"}, "c": "4"},
+    ]
+
+    assert len(list(expand_sweep("a=1,1,2"))) == 2
+    assert len(list(expand_sweep("a=1,1,2", deduplicate=False))) == 3
+
+
+def test_expand_sweep_with_module(sweep_modules):
+    RankTask = sweep_modules
+
+    configs = list(expand_sweep("searcher.b=0.1..0.3,0.1 x index.stemmer=porter,krovetz", module_cls=RankTask))
+    assert len(configs) == 6
+    assert configs[0] == {"searcher": {"b": "0.1"}, "index": {"stemmer": "porter"}}
+
+    # the index is provided to the searcher, so searcher.index.stemmer has no effect and these configs collapse
+    configs = list(expand_sweep("searcher.b=0.1,0.2 x searcher.index.stemmer=porter,krovetz", module_cls=RankTask))
+    assert configs == [
+        {"searcher": {"b": "0.1", "index": {"stemmer": "porter"}}},
+        {"searcher": {"b": "0.2", "index": {"stemmer": "porter"}}},
+    ]
+
+    # equivalent values are deduplicated after casting
+    assert len(list(expand_sweep("searcher.b=0.1,0.10,0.2", module_cls=RankTask))) == 2
+
+    with pytest.raises(InvalidConfigError):
+        list(expand_sweep("searcher.invalid=1,2", module_cls=RankTask))
@@ -1,3 +1,7 @@
+import gc
+import json
+import weakref
+
 import pytest
 
 # import constants
@@ -11,6 +15,7 @@ from profane.base import (
     constants,
     _DEFAULT_RANDOM_SEED,
 )
+from profane.cache import SharedObjectCache
 
 
 @pytest.fixture
@@ -354,6 +359,76 @@ def test_skip_config_in_module_path(rank_modules):
     assert rerank.get_module_path(skip_config_keys=["fold", "seed"]).endswith("/task-rerank_optimize-map")
 
 
+def test_module_path_memoization(rank_modules, tmp_path):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    constants["CACHE_BASE_PATH"] = tmp_path
+
+    rerank = RerankTask.create("rerank")
+    path = rerank.get_module_path()
+    assert rerank.get_module_path() is path
+    assert rerank.get_module_path(skip_config_keys=["seed", "fold"]) is rerank.get_module_path(skip_config_keys=("fold", "seed"))
+    assert rerank.get_module_path(skip_config_keys="fold").endswith("/task-rerank_optimize-map_seed-42")
+    assert rerank.get_cache_path() is rerank.get_cache_path()
+    assert rerank.get_cache_path() == tmp_path / path
+
+    # paths of shared dependencies are computed once and reused by other modules
+    rank = RankTask.create("rank")
+    assert rank.searcher is rerank.rank.searcher
+    assert rank.get_module_path() is rerank.rank.get_module_path()
+    assert rank.get_module_path() in path
+
+    # the cached absolute path follows changes to CACHE_BASE_PATH
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path / "other"
+    assert rerank.get_cache_path() == tmp_path / "other" / path
+
+
+def test_config_digest(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+
+    rerank = RerankTask()
+    digest = rerank.config_digest()
+    assert len(digest) == 64 and digest == RerankTask().config_digest()
+    # digests are stable across processes and versions, so they must not change
+    assert rerank.rank.searcher.index.config_digest() == "ae81ebcd3337433b163d426b2f2032b31b5ec284fac8997445c21fec2a3351ab"
+
+    assert RerankTask({"fold": "s2"}).config_digest() != digest
+    assert RerankTask({"rank": {"searcher": {"k1": 0.5}}}).config_digest() != digest
+    assert rerank.config_digest(skip_config_keys="fold") == RerankTask({"fold": "s2"}).config_digest(skip_config_keys="fold")
+    assert rerank.config_digest(skip_config_keys="fold") != digest
+
+    # resolved modules have the same digests
+    assert RerankTask.resolve().config_digest() == digest
+
+
+def test_digest_cache_layout(rank_modules, tmp_path):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    constants["CACHE_BASE_PATH"] = tmp_path
+    constants["CACHE_LAYOUT"] = "digest"
+
+    # caches created with the module path layout remain readable
+    legacy = RankTask({"searcher": {"k1": 0.5}})
+    legacy_path = tmp_path / legacy.get_module_path()
+    legacy_path.mkdir(parents=True)
+    assert legacy.get_cache_path() == legacy_path
+
+    rerank = RerankTask()
+    digest = rerank.config_digest()
+    assert rerank.get_cache_path() == tmp_path / digest[:2] / digest
+
+    with open(tmp_path / digest[:2] / (digest + ".json"), "rt") as f:
+        sidecar = json.load(f)
+    assert sidecar["digest"] == digest
+    assert sidecar["module_path"] == rerank.get_module_path()
+    assert sidecar["config"] == rerank.config
+
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+    constants["CACHE_LAYOUT"] = "other"
+    with pytest.raises(ValueError):
+        rerank.get_cache_path()
+
+
 def test_registry_enumeration(rank_modules):
     assert module_registry.get_module_types() == [
         "benchmark",
@@ -371,3 +446,184 @@ def test_registry_enumeration(rank_modules):
     assert module_registry.get_module_names("index") == ["anserini"]
     assert module_registry.get_module_names("searcher") == ["bm25"]
     assert module_registry.get_module_names("task") == ["rank", "rerank", "threerank", "tworank"]
+
+
+def test_compute_config_matches_instantiation(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+
+    configs = [
+        {},
+        {"benchmark": {"name": "trecdl"}},
+        {"tworank": {"benchmark": {"name": "rob04yang"}}, "rank3": {"benchmark": {"name": "trecdl"}}},
+        {"rank1a": {"searcher": {"k1": 0.5}}, "rank1b": {"searcher": {"k1": 1.0, "index": {"stemmer": "none"}}}},
+        "rank3.searcher.k1=0.7 tworank.rank1a.searcher.index.stemmer=krovetz",
+    ]
+
+    for cls in rank_modules:
+        for config in configs:
+            try:
+                expected = cls(config, build=False).config
+            except Exception as e:
+                with pytest.raises(type(e)):
+                    cls.compute_config(config)
+                continue
+
+            assert cls.compute_config(config) == expected
+            # the second call may use cached sub-configs
+            assert cls.compute_config(config) == expected
+
+    benchmark = module_registry.lookup("benchmark", "trecdl")()
+    assert RankTask.compute_config(provide=benchmark) == RankTask(provide=benchmark).config
+
+
+def test_compute_config_cache(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    cache = module_registry.config_cache
+
+    ThreeRankTask.compute_config({"rank3": {"searcher": {"k1": 0.1}}})
+    misses = cache.misses
+    hits = cache.hits
+
+    # only the path from the root to the changed searcher needs to be resolved again
+    ThreeRankTask.compute_config({"rank3": {"searcher": {"k1": 0.2}}})
+    assert cache.misses - misses == 3
+    assert cache.hits > hits
+
+    # equal values with different types are not confused
+    assert ThreeRankTask.compute_config({"rank3": {"searcher": {"k1": 1}}})["rank3"]["searcher"]["k1"] == 1.0
+    assert RerankTask.compute_config({"fold": 1})["fold"] == "1"
+    assert RerankTask.compute_config({"fold": True})["fold"] == "True"
+
+    module_registry.config_cache.maxsize = 2
+    ThreeRankTask.compute_config()
+    assert len(cache) == 2
+    assert cache.evictions > 0
+
+
+def test_resolve_without_building(rank_modules, capsys):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+
+    def fail(self):
+        raise RuntimeError("resolve should never build modules")
+
+    config = {"rank1b": {"searcher": {"k1": 0.5}}, "benchmark": {"name": "trecdl"}}
+    expected = TwoRankTask(config, build=False)
+
+    module_registry.lookup("collection", "msmarco").build = fail
+    resolved = TwoRankTask.resolve(config)
+
+    assert resolved.config == expected.config
+    assert resolved.get_module_path() == expected.get_module_path()
+    assert resolved.rank1b.searcher.get_module_path() == expected.rank1b.searcher.get_module_path()
+    assert resolved.rank1a.get_module_path(skip_config_keys="seed") == expected.rank1a.get_module_path(skip_config_keys="seed")
+
+    # provided modules are shared in the same way as with module objects
+    assert resolved.rank1a.benchmark is resolved.rank1b.benchmark
+    assert resolved.rank1a.searcher.index.collection is resolved.benchmark.collection
+    assert "benchmark" in resolved.rank1a._provided_dependency
+
+    expected.print_module_graph()
+    expected.print_module_config()
+    expected_output = capsys.readouterr().out
+    resolved.print_module_graph()
+    resolved.print_module_config()
+    assert capsys.readouterr().out == expected_output
+
+
+def test_shared_object_eviction(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    module_registry.shared_objects = SharedObjectCache(maxsize=2)
+
+    tworank = TwoRankTask.create("tworank")
+    assert module_registry.shared_objects.evictions > 0
+    assert len(module_registry.shared_objects._strong) == 2
+
+    # objects referenced by a live pipeline are still shared after being evicted
+    assert TwoRankTask.create("tworank") is tworank
+    assert RankTask.create("rank", tworank.rank1a.config) is tworank.rank1a
+    assert module_registry.shared_objects.get(tworank.rank1b.searcher.index.config) is tworank.rank1b.searcher.index
+
+    # once the pipeline is gone and has been evicted by newer objects, its modules are dropped
+    tworank_config, searcher_config = tworank.config, tworank.rank1a.searcher.config
+    del tworank
+    rank = RankTask.create("rank", {"searcher": {"k1": 0.3}})
+    gc.collect()
+    assert tworank_config not in module_registry.shared_objects
+    assert searcher_config not in module_registry.shared_objects
+    assert rank.searcher.config in module_registry.shared_objects
+
+    stats = module_registry.shared_objects.stats()
+    assert stats["hits"] > 0 and stats["misses"] > 0 and stats["held"] == 2
+
+
+def test_evicted_provided_modules_are_dropped(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    module_registry.shared_objects = SharedObjectCache(maxsize=0)
+
+    # each rank task provides its benchmark's collection to its searcher's index
+    ranks = [RankTask.create("rank", {"searcher": {"k1": k1}}) for k1 in [0.3, 0.5, 0.7]]
+    collections = [weakref.ref(rank.searcher.index.collection) for rank in ranks]
+    assert all(rank.searcher.index.collection is rank.benchmark.collection for rank in ranks)
+
+    # resolving configs must not keep provided modules alive
+    del ranks
+    gc.collect()
+    assert [collection() for collection in collections] == [None, None, None]
+
+
+def test_create_resolves_each_module_once(rank_modules, monkeypatch):
+    depth = 20
+    for level in range(depth):
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        if level > 0:
+            dependencies.append(Dependency(key="previous", module=f"level{level - 1}", name="chain"))
+        attrs = {"module_type": f"level{level}", "module_name": "chain", "dependencies": dependencies}
+        ModuleBase.register(type(f"Level{level}", (ModuleBase,), attrs))
+
+    @ModuleBase.register
+    class Root(ModuleBase):
+        module_type = "root"
+        module_name = "chain"
+        dependencies = [
+            Dependency(key="collection", module="collection", name="robust04", provide_this=True),
+            Dependency(key="chain", module=f"level{depth - 1}", name="chain"),
+        ]
+
+    resolve = ModuleBase.resolve.__func__
+    calls = []
+
+    def counted_resolve(cls, config=None, provide=None):
+        calls.append(cls)
+        return resolve(cls, config, provide)
+
+    monkeypatch.setattr(ModuleBase, "resolve", classmethod(counted_resolve))
+
+    # every module in the chain is created with the provided collection, so none of its resolutions are cached.
+    # the modules are resolved along with the root rather than again by each nested create
+    root = Root.create("chain")
+    assert root.chain.collection is root.collection
+    assert len(calls) == depth + 2
+    # the chain is still shared with modules created on their own
+    assert module_registry.lookup(f"level{depth - 1}", "chain").create("chain", provide=root.collection) is root.chain
+
+
+def test_shared_object_memory_budget(rank_modules):
+    ThreeRankTask, TwoRankTask, RankTask, RerankTask = rank_modules
+    module_registry.shared_objects = SharedObjectCache(max_bytes=100)
+
+    searcher_cls = module_registry.lookup("searcher", "bm25")
+    searcher_cls.estimate_memory_size = lambda self: 60
+
+    first = searcher_cls.create("bm25")
+    assert module_registry.shared_objects.bytes == 60
+
+    # the new searcher exceeds the budget, so the old one is evicted but remains shared while it is referenced
+    second = searcher_cls.create("bm25", {"k1": 0.5})
+    assert module_registry.shared_objects.bytes == 60
+    assert module_registry.shared_objects.evictions == 1
+    assert searcher_cls.create("bm25") is first
+
+    # modules without a size estimate do not count against the budget
+    assert RankTask.create("rank", {"searcher": {"k1": 1.0}}).searcher is first
+    assert module_registry.shared_objects.bytes == 60
+    assert second.index is first.index
@@ -0,0 +1,135 @@
+import json
+import re
+import time
+
+import pytest
+
+from profane import ConfigOption, Dependency, ModuleBase, Tracer, constants, module_registry
+from profane.trace import active_tracer
+
+
+@pytest.fixture
+def rank_cls(tmp_path):
+    module_registry.reset()
+    constants.reset()
+    constants["CACHE_BASE_PATH"] = tmp_path
+
+    @ModuleBase.register
+    class Collection(ModuleBase):
+        module_type = "collection"
+        module_name = "robust04"
+
+    @ModuleBase.register
+    class Benchmark(ModuleBase):
+        module_type = "benchmark"
+        module_name = "rob04yang"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+
+    @ModuleBase.register
+    class Index(ModuleBase):
+        module_type = "index"
+        module_name = "anserini"
+        dependencies = [Dependency(key="collection", module="collection", name="robust04")]
+        config_spec = [ConfigOption(key="stemmer", default_value="porter")]
+
+        def build(self):
+            time.sleep(0.01)
+
+    @ModuleBase.register
+    class Searcher(ModuleBase):
+        module_type = "searcher"
+        module_name = "bm25"
+        dependencies = [Dependency(key="index", module="index", name="anserini")]
+
+    @ModuleBase.register
+    class Rank(ModuleBase):
+        module_type = "task"
+        module_name = "rank"
+        dependencies = [
+            Dependency(key="benchmark", module="benchmark", name="rob04yang", provide_children=["collection"]),
+            Dependency(key="searcher1", module="searcher", name="bm25"),
+            Dependency(key="searcher2", module="searcher", name="bm25"),
+        ]
+
+    return Rank
+
+
+def test_trace_spans(rank_cls, tmp_path):
+    assert active_tracer() is None
+    with Tracer() as tracer:
+        assert active_tracer() is tracer
+        rank = module_registry.lookup("task", "rank").create("rank")
+    assert active_tracer() is None
+
+    creates = [span for span in tracer.iter_spans() if span.name == "create"]
+    assert [(span.args["module"], span.args["shared"]) for span in creates] == [
+        ("task=rank", "miss"),
+        ("benchmark=rob04yang", "miss"),
+        ("collection=robust04", "miss"),
+        ("searcher=bm25", "miss"),
+        ("index=anserini", "miss"),
+        ("searcher=bm25", "hit"),
+    ]
+
+    constructs = [span for span in tracer.iter_spans() if span.name == "construct"]
+    assert constructs[0].args["module_path"] == rank.get_module_path()
+    assert [child.name for child in constructs[0].children] == ["validate", "dependencies"]
+
+    dependencies = [span for span in tracer.iter_spans() if span.name == "dependencies"]
+    assert dependencies[0].args["created"] == ["benchmark", "searcher1", "searcher2"]
+    assert dependencies[-1].args["provided"] == {"collection": "collection=robust04"}
+
+    builds = [span for span in tracer.iter_spans() if span.name == "build"]
+    # the second searcher is a shared object, so its index is not constructed or built again
+    assert len(builds) == 1 and builds[0].duration >= 0.01
+
+    tracer.write_chrome_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json", "rt") as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == len(list(tracer.iter_spans()))
+    assert events[0]["name"] == "create task=rank" and events[0]["ph"] == "X" and events[0]["dur"] > 10000
+
+
+def test_trace_summary(rank_cls):
+    with Tracer() as tracer:
+        rank_cls()
+
+    lines = tracer.summary().split("\n")
+    assert [re.match(r"\s*\S+", line).group() for line in lines] == [
+        "task=rank",
+        "    benchmark=rob04yang",
+        "        collection=robust04",
+        "    searcher=bm25",
+        "        index=anserini",
+        "            collection=robust04",
+        "    searcher=bm25",
+        "        index=anserini",
+        "            collection=robust04",
+    ]
+    assert lines[0].endswith("[created]") and "build" not in lines[0]
+    # dependencies are not shared unless the module is created with ModuleBase.create
+    assert lines[4].endswith("[shared object: disabled]") and "build" in lines[4]
+    assert lines[5].endswith("[provided by pipeline]")
+
+    # with create, the second searcher is a shared object, so its graph is not constructed again
+    with Tracer() as tracer:
+        rank_cls.create("rank")
+
+    lines = tracer.summary().split("\n")
+    assert [re.match(r"\s*\S+", line).group() for line in lines] == [
+        "task=rank",
+        "    benchmark=rob04yang",
+        "        collection=robust04",
+        "    searcher=bm25",
+        "        index=anserini",
+        "            collection=robust04",
+        "    searcher=bm25",
+    ]
+    assert lines[3].endswith("[shared object: miss]") and lines[6].endswith("[shared object: hit]")
+
+
+def test_no_tracer(rank_cls):
+    # nothing is recorded unless a tracer is active
+    tracer = Tracer()
+    rank_cls()
+    assert tracer.spans == []
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from profane.sql import DBManager, Run
+from profane.worker import Worker, _Child, load_function
+
+
+def record_pid(command, config):
+    if config.get("fail"):
+        raise RuntimeError("failing as requested")
+
+    with open(os.path.join(config["outdir"], str(config["idx"])), "wt") as f:
+        print(os.getpid(), file=f)
+
+
+def test_worker_recycles_children(tmpdir):
+    url = f"sqlite:///{tmpdir}/runs.db"
+    db = DBManager(url)
+    run_ids = db.queue_runs(("record", {"outdir": str(tmpdir), "idx": idx}, 0) for idx in range(6))
+    failed_id = db.queue_run("record", {"fail": True})
+
+    worker = Worker(url, record_pid, processes=2, max_runs_per_child=2, max_tries=2, exit_when_idle=True)
+    worker.run()
+
+    with db.session_scope() as session:
+        statuses = {run.run_id: (run.status, run.tries) for run in session.query(Run)}
+    assert all(statuses[run_id] == ("COMPLETED", 1) for run_id in run_ids)
+    assert statuses[failed_id] == ("FAILED", 2)
+
+    pids = set()
+    for idx in range(6):
+        with open(os.path.join(tmpdir, str(idx)), "rt") as f:
+            pids.add(int(f.read()))
+
+    # each child may only complete two runs
+    assert len(pids) >= 3
+    assert os.getpid() not in pids
+
+
+def test_load_function():
+    assert load_function("os.path:join") == os.path.join
+
+    with pytest.raises(ValueError):
+        load_function("os.path.join")
+
+
+def test_worker_with_missing_function(tmpdir):
+    url = f"sqlite:///{tmpdir}/runs.db"
+    db = DBManager(url)
+    run_id = db.queue_run("record", {"idx": 0})
+
+    # the function is imported before any runs are claimed
+    with pytest.raises(ModuleNotFoundError):
+        Worker(url, "nosuchmod:fn", processes=2, exit_when_idle=True)
+
+    with db.session_scope() as session:
+        assert session.query(Run).filter(Run.run_id == run_id).one().status == "QUEUED"
+
+
+def test_child_exits_before_assign(tmpdir):
+    url = f"sqlite:///{tmpdir}/runs.db"
+    db = DBManager(url)
+    db.queue_runs(("record", {"idx": idx}, 0) for idx in range(2))
+    worker = Worker(url, record_pid)
+
+    children = [_Child(worker), _Child(worker)]
+    children[0].process.kill()
+    children[0].process.join()
+
+    # the run sent to the dead child is marked as failed, and the other child is still stopped
+    run, other = db.claim_runs(n=2)
+    children[0].assign(run)
+    for child in children:
+        child.stop()
+
+    with db.session_scope() as session:
+        statuses = {run.run_id: run.status for run in session.query(Run)}
+    assert statuses == {run.run_id: "FAILED", other.run_id: "RUNNING"}
+    assert not children[1].process.is_alive()